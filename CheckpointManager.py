@@ -0,0 +1,151 @@
+"""
+Weight checkpoints written by a background thread, so training frames never
+wait on the disk. A checkpoint is written at most once per interval, only if
+the weights or their metadata changed since the last one, and atomically:
+the file is written next to its destination and renamed over it, so a crash
+never leaves a half-written weight file. The last keep checkpoints are kept as path,
+path.1, path.2... A checkpoint that fails is logged and retried with the
+next one, the thread keeps running. Once the manager is closed, save
+writes the checkpoint right away, in the calling thread.
+"""
+import atexit
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+
+logger = logging.getLogger(__name__)
+
+def writeJSON(path, weights, metadata=None):
+    '''
+    Default checkpoint writer: the weights as a JSON object, like Weight.json.
+    JSON weight files have no metadata.
+    '''
+    with open(path, 'w') as json_file:
+        json.dump(weights, json_file)
+
+class CheckpointManager():
+
+    def __init__(self, path, interval=30.0, keep=3, writer=writeJSON):
+        self.path = path
+        self.interval = interval # seconds between two checkpoints
+        self.keep = keep # number of checkpoints kept, the current one included
+        self.writer = writer # writer(path, weights, metadata) writes a checkpoint file, e.g. WeightFile.saveWeightDict
+        self.lock = threading.Lock()
+        self.writeLock = threading.Lock() # held while a checkpoint is written
+        self.wakeUp = threading.Event()
+        self.pending = None # weights waiting to be written
+        self.lastDigest = None # digest of the last weights and metadata written, to skip unchanged ones
+        self.writeCount = 0
+        self.thread = None
+        self.closed = False
+
+    def save(self, weights, metadata=None, now=False):
+        '''
+        Queues weights (a dict of feature name -> weight, copied by the
+        caller) and their metadata for the next checkpoint and returns right
+        away. Weights queued before they were written are replaced. With now,
+        the checkpoint is written without waiting for the interval. After
+        close, there is no thread left to write it, so it is written before
+        save returns.
+        '''
+        with self.lock:
+            self.pending = (weights, metadata)
+            closed = self.closed
+            if self.thread is None and not closed:
+                self.thread = threading.Thread(target=self._run, name='CheckpointManager', daemon=True)
+                self.thread.start()
+                atexit.register(self.close)
+        if closed:
+            self._writePending()
+        elif now:
+            self.wakeUp.set()
+
+    def _run(self):
+        while not self.closed:
+            self.wakeUp.wait(self.interval)
+            self.wakeUp.clear()
+            self._writePending()
+
+    def _writePending(self):
+        with self.writeLock: # a save after close may write while the thread writes its last checkpoint
+            with self.lock:
+                pending, self.pending = self.pending, None
+            if pending is None:
+                return
+            weights, metadata = pending
+            try:
+                digest = hashlib.sha1(json.dumps([weights, metadata], sort_keys=True).encode()).digest()
+                if digest == self.lastDigest: # same weights and metadata as the last checkpoint
+                    return
+                tempPath = self.path + '.tmp'
+                self.writer(tempPath, weights, metadata)
+                self._sync(tempPath)
+                self._rotate()
+                os.replace(tempPath, self.path)
+                self._syncDirectory()
+            except Exception:
+                logger.exception('checkpoint of %s failed', self.path)
+                with self.lock:
+                    if self.pending is None: # nothing newer to write, retry these weights next time
+                        self.pending = pending
+                return
+            self.lastDigest = digest
+            self.writeCount += 1
+
+    def _sync(self, path):
+        '''
+        Flushes a written file to the disk, so the rename never publishes an
+        empty or truncated checkpoint after a crash.
+        '''
+        with open(path, 'rb+') as checkpointFile:
+            checkpointFile.flush()
+            os.fsync(checkpointFile.fileno())
+
+    def _syncDirectory(self):
+        '''
+        Flushes the rename to the disk. Directories cannot be opened on
+        every platform (e.g. Windows), there the rename is left to the OS.
+        '''
+        try:
+            directory = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(directory)
+        except OSError:
+            pass
+        finally:
+            os.close(directory)
+
+    def _rotate(self):
+        '''
+        Shifts path.1 to path.2 and so on, dropping the oldest checkpoint.
+        '''
+        if self.keep <= 1 or not os.path.exists(self.path):
+            return
+        for index in range(self.keep - 1, 1, -1):
+            olderPath = '{}.{}'.format(self.path, index - 1)
+            if os.path.exists(olderPath):
+                os.replace(olderPath, '{}.{}'.format(self.path, index))
+        if os.path.exists(self.path + '.1'):
+            os.remove(self.path + '.1')
+        try: # path stays in place until the new checkpoint replaces it
+            os.link(self.path, self.path + '.1')
+        except OSError:
+            shutil.copyfile(self.path, self.path + '.1')
+
+    def close(self):
+        '''
+        Writes the queued weights and stops the thread.
+        '''
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+        if self.thread is not None:
+            self.wakeUp.set()
+            self.thread.join()
+        self._writePending()
@@ -4,11 +4,20 @@ features could be defined as number of empty spots at each line, location of emp
 and next object. 
 gameState could be defined as all of the information needed for the feature + score + currentLevel + possible actions
 """
+import os
 import random
 import util
 import json
 import pprint
 import numpy as np
+from tetrisEngine import actionNames
+from CheckpointManager import CheckpointManager
+import WeightFile
+
+BOARD_CACHE_SIZE = 4096 # number of boards whose values are kept by TetrisQAgent
+WEIGHT_FILE = 'Weight.bin' # weights of TetrisQAgent, see WeightFile
+WEIGHT_JSON_FILE = 'Weight.json' # imported when there is no WEIGHT_FILE yet
+
 class ApproximateQAgent():
     '''
     Module used for an approximateQAgent with features. This class implements
@@ -16,8 +25,11 @@ class ApproximateQAgent():
     getFeatures(), rewardFunction(), final(), and getWeights() Functions.
     '''
 
-    def __init__(self, gameState):
-        self.weights = util.Counter(self.getWeights())
+    def __init__(self, gameState, seed=None, replayBuffer=None, batchSize=32):
+        self.random = random.Random(seed) # own random stream, so exploration can be replayed from the seed
+        self.replayBuffer = replayBuffer # if given, every update also trains on a minibatch of past transitions
+        self.batchSize = batchSize
+        self.setWeights(self.getWeights() or {})
         self.previousAction = None
         self.maxEpisodes = 150
         self.currEpisode = 0
@@ -32,37 +44,135 @@ class ApproximateQAgent():
         # Turn off learning parameters by changing discount and epsilon to be zero
         
 
+    def setWeights(self, weights):
+        '''
+        Loads a dict of feature name -> weight, or the WeightFile.Weights of a
+        weight file. Every feature gets an index in featureIndex, and its
+        weight is stored at that index of weightVector.
+        '''
+        if isinstance(weights, WeightFile.Weights):
+            self.featureIndex = util.FeatureIndex(weights.names)
+            self.weightVector = np.array(weights.vector, dtype=np.float64)
+            self.weightMetadata = weights.metadata
+        else:
+            self.featureIndex = util.FeatureIndex(weights)
+            self.weightVector = np.array([weights[name] for name in self.featureIndex], dtype=np.float64)
+            self.weightMetadata = {}
+
+    @property
+    def weights(self):
+        '''
+        Returns the weights by feature name, as a util.Counter. It is a copy,
+        used to export the weights (e.g. to Weight.json).
+        '''
+        return util.Counter(zip(self.featureIndex.names, self.weightVector.tolist()))
+
+    def getWeight(self, feature):
+        index = self.featureIndex.get(feature)
+        if index is None or index >= len(self.weightVector): # not registered, or registered since the vector last grew
+            return 0.0
+        return self.weightVector[index]
+
+    def getSparseFeatures(self, features):
+        '''
+        Returns the features (a util.Counter from getFeatures) as an array of
+        feature indices and an array of values. Features seen for the first
+        time are registered, with a weight of 0.
+        '''
+        indices = []
+        values = []
+        for feature, value in features.items():
+            if value is not None:
+                indices.append(self.featureIndex.add(feature))
+                values.append(value)
+        self._growWeightVector()
+        return np.array(indices, dtype=np.intp), np.array(values, dtype=np.float64)
+
+    def getFeatureMatrix(self, gameState, actions):
+        '''
+        Returns the dense feature vectors of the actions, one row per action.
+        '''
+        rows = []
+        indices = []
+        values = []
+        for row, action in enumerate(actions):
+            for feature, value in self.getFeatures(gameState, action).items():
+                if value is not None:
+                    rows.append(row)
+                    indices.append(self.featureIndex.add(feature))
+                    values.append(value)
+        self._growWeightVector()
+        featureMatrix = np.zeros((len(actions), len(self.featureIndex)))
+        featureMatrix[rows, indices] = values
+        return featureMatrix
+
+    def _growWeightVector(self):
+        '''
+        Adds a weight of 0 for the features registered since the last call.
+        '''
+        if len(self.featureIndex) > len(self.weightVector):
+            self.weightVector = np.concatenate((self.weightVector, np.zeros(len(self.featureIndex) - len(self.weightVector))))
+
+    def evaluateFeatures(self, features):
+        '''
+        Returns the value of a util.Counter of features for the current weights.
+        '''
+        indices, values = self.getSparseFeatures(features)
+        return float(self.weightVector[indices] @ values)
+
+    def getQValues(self, gameState, actions):
+        '''
+        Returns the Q values of all the actions in gameState, as one
+        vectorised matrix-vector product.
+        '''
+        featureMatrix = self.getFeatureMatrix(gameState, actions)
+        # same sum for equal rows, so ties between actions are kept (a BLAS product may round rows differently)
+        return (featureMatrix * self.weightVector).sum(axis=1)
+
     def getQValue(self, gameState, action):
         '''
         Takes a gamestate and an action and returns the Q value for the state-action pair.
         '''
-        features = self.getFeatures(gameState, action)  # get features
-        weights = self.weights
-        QValue = 0
-        for feature in features:  # loop through features
-            if features[feature] == None:
-                continue
-            try:
-                QValue += features[feature] * weights[feature]  # implement equation
-            except:
-                print("Error with feature: {}\n".format(feature))
-                continue
-        return QValue
+        return self.evaluateFeatures(self.getFeatures(gameState, action))
 
     def update(self, gameState, action, nextGameState, reward):
         """
         updates weights based on transition (used for training)
         """
-        QValueOldState = self.getQValue(gameState, action)  # current state QValue
-        QValueNextState = self.getValue(nextGameState)  # next state value
+        indices, values = self.getSparseFeatures(self.getFeatures(gameState, action))
+        QValueOldState = float(self.weightVector[indices] @ values)  # current state QValue
+        nextActions = nextGameState.getLegalActions()
+        nextFeatureMatrix = self.getFeatureMatrix(nextGameState, nextActions)
+        QValueNextState = float(np.max((nextFeatureMatrix * self.weightVector).sum(axis=1))) if len(nextActions) > 0 else 0.0  # next state value
         difference = (reward + (self.discount * QValueNextState)) - QValueOldState
-        features = self.getFeatures(gameState, action)
-        for feature in features:  # loop through features
-            self.weights[feature] += (self.alpha * difference * features[feature])  # implement equations
+        self.weightVector[indices] += self.alpha * difference * values  # w += alpha * difference * features
+        if self.replayBuffer is not None:
+            features = np.zeros(len(self.featureIndex))
+            features[indices] = values
+            nextLegal = [actionNames.index(nextAction) for nextAction in nextActions]
+            self.replayBuffer.add(features, actionNames.index(action), reward, nextFeatureMatrix, nextLegal, nextGameState.isTerminal())
+            self.replayUpdate()
+
+    def replayUpdate(self):
+        """
+        TD update on a minibatch sampled from the replay buffer, with the
+        same step size as an online update
+        """
+        if len(self.replayBuffer) < self.batchSize:
+            return
+        batchIndices, features, actions, rewards, nextFeatures, nextLegal, dones, sampleWeights = self.replayBuffer.sample(self.batchSize)
+        featureNum = len(self.weightVector)
+        features = features[:, :featureNum]
+        QValues = features @ self.weightVector
+        nextQValues = np.where(nextLegal, nextFeatures[:, :, :featureNum] @ self.weightVector, -np.inf).max(axis=1)
+        nextQValues[dones | ~nextLegal.any(axis=1)] = 0.0 # no next action
+        differences = (rewards + self.discount * nextQValues) - QValues
+        self.weightVector += self.alpha * ((sampleWeights * differences) @ features) / self.batchSize
+        self.replayBuffer.updatePriorities(batchIndices, differences)
 
     def chooseAction(self, gameState):
-        if util.flipCoin(self.epsilon):
-            action = random.choice(gameState.getLegalActions())
+        if util.flipCoin(self.epsilon, self.random):
+            action = self.random.choice(gameState.getLegalActions())
         else:
             action = self.computeActionFromQValues(gameState)
         return action
@@ -84,11 +194,8 @@ class ApproximateQAgent():
         possibleActions = gameState.getLegalActions()
         if len(possibleActions) == 0:
             return None
-        QValues = util.Counter()
-        for action in possibleActions:  # loop through possible actions
-            QValue = self.getQValue(gameState, action)
-            QValues[action] = QValue
-        return QValues.argMax()
+        QValues = self.getQValues(gameState, possibleActions)
+        return possibleActions[int(np.argmax(QValues))] # first best action
 
     def computeValueFromQValues(self, gameState):
         """
@@ -97,14 +204,10 @@ class ApproximateQAgent():
         there are no legal actions, which is the case at the
         terminal state, you should return a value of 0.0.
         """
-        compareList = []  # Put all possible action combinations for one state and get max
         possibleActions = gameState.getLegalActions()
         if len(possibleActions) == 0:# terminal state check
             return 0.0
-        for action in possibleActions:  # Loop through legal actions
-            QValue = self.getQValue(gameState, action)
-            compareList.append(QValue)  # Add QValues of all legal actions for that state in compareList
-        return max(compareList)  # Return the top
+        return float(np.max(self.getQValues(gameState, possibleActions)))  # Return the top
 
     def getValue(self, gameState):
         '''
@@ -142,27 +245,32 @@ class TetrisQAgent(ApproximateQAgent):
     Tetris Approximate Q Agent
     '''
 
-    def __init__(self, gameState):
-        ApproximateQAgent.__init__(self, gameState)
+    def __init__(self, gameState, seed=None, replayBuffer=None, batchSize=32):
+        ApproximateQAgent.__init__(self, gameState, seed, replayBuffer, batchSize)
+        self.currEpisode = self.weightMetadata.get('episodes', 0)
+        self.checkpoints = CheckpointManager(WEIGHT_FILE, writer=WeightFile.saveWeightDict) # writes the weights in the background
+        self.boardCache = util.LRUCache(BOARD_CACHE_SIZE) # board hash -> values of _getBoardValues
 
     def getWeights(self):
         '''
-        Gets the weights for features. Weights are hardcoded in after training
+        Gets the weights for features from the weight file, or imports them
+        from the JSON weight file if there is no weight file yet. Without
+        either file the agent starts without weights. A file that cannot be
+        read is an error, not an untrained agent.
         '''
-        # transform json dict to counter object
-        try:
-            with open('Weight.json') as json_file: # if weight file exists, use it.
-                weights = json.load(json_file)
-                return weights
-        except Exception:
-            return {}
+        if os.path.exists(WEIGHT_FILE):
+            return WeightFile.loadWeights(WEIGHT_FILE)
+        if os.path.exists(WEIGHT_JSON_FILE):
+            with open(WEIGHT_JSON_FILE) as json_file:
+                return json.load(json_file)
+        return {}
     
     def final(self, gameState):
         self.currEpisode += 1
         #if self.currEpisode > self.maxEpisodes: # if training is over
          #   self.maxEpisodes += 100
-        with open("Weight.json", 'w') as json_file:
-            json.dump(self.weights, json_file)
+        metadata = {'episodes': self.currEpisode, 'alpha': self.alpha, 'epsilon': self.epsilon, 'discount': self.discount}
+        self.checkpoints.save(self.weights, metadata)
 
 
     def getFeatures(self, gameState, action):
@@ -196,28 +304,31 @@ class TetrisQAgent(ApproximateQAgent):
         #features['smoothnessRows'] = self._smoothnessRows(gameState)
         #print(features['smoothnessColumns'])
         features.divideAll(100.0)
-        while self.weights[features.argMax()] > 10000: # buffer
-            self.weights.divideAll(100)
+        maxFeature = features.argMax()
+        while self.getWeight(maxFeature) > 10000: # buffer
+            self.weightVector /= 100
         return features
     
     
 
+    def getBoardFeatures(self, gameState):
+        '''
+        Returns the features of getFeatures that only depend on the board's
+        blocks, scaled the same way. Unlike getFeatures it never rescales
+        the weights, so planners can score boards with it.
+        '''
+        features = util.Counter()
+        features['bias'] = 1.0
+        features['smoothnessColumns'] = self._smoothnessColumns(gameState)
+        features.divideAll(100.0)
+        return features
+
     def _smoothnessRows(self, gameState):
         ''' 
         Calculates the smoothness of the Rows by calculating
         the standard deviation of the width of the rows
         '''
-        space = gameState.getStateSpace()
-        rowWidths = []
-        # calculate heights of each column
-        i = 0
-        for x in range(len(space[i])):
-            i+=1
-            rowWidth = 0
-            for y in range(len(space)):
-                rowWidth += 1 if space[y][x] == 'empty' else 0.0
-            rowWidths.append(rowWidth) # append height of each column
-        return np.std(rowWidths) # calculate stdDeviation
+        return self._getBoardValues(gameState)['smoothnessRows']
 
     
     
@@ -226,34 +337,40 @@ class TetrisQAgent(ApproximateQAgent):
         Calculates the smoothness of the columns by calculating
         the standard deviation of the height of the columns
         '''
-        space = gameState.getStateSpace()
-        colHeights = []
-        # calculate heights of each column
-        for x in range(len(space)):
-            colHeight = 0
-            for y in range(len(space[x])):
-                colHeight += 1 if space[x][y] != 'empty' else 0.0
-            colHeights.append(colHeight) # append height of each column
-        return np.std(colHeights) # calculate stdDeviation
+        return self._getBoardValues(gameState)['smoothnessColumns']
+
+    def _getBoardValues(self, gameState):
+        '''
+        Returns the values that only depend on the board's blocks. They are
+        cached by board hash, so a board is evaluated once however many
+        actions, successors and rewards look at it.
+        '''
+        boardValues = self.boardCache.get(gameState.getBoardHash())
+        if boardValues is None:
+            occupancy = gameState.getOccupancy()
+            boardValues = {
+                'smoothnessColumns': np.std(np.count_nonzero(occupancy, axis=1)), # std of the blocks of each row of the board
+                'smoothnessRows': np.std(np.count_nonzero(~occupancy, axis=0)), # std of the empty cells of each column
+            }
+            self.boardCache.put(gameState.getBoardHash(), boardValues)
+        return boardValues
 
     def _getNumEmptySpots(self, gameState, features):
         """ 
         Feature that gets the number of empty spots in the entire board,
         """
-        space = gameState.getStateSpace()
-        for x in range(len(space)):
-            for y in range(len(space[x])):
-                features['numEmptySpots'] += 1.0 if space[x][y] == 'empty' else 0.0
+        occupancy = gameState.getOccupancy()
+        features['numEmptySpots'] += float(np.count_nonzero(~occupancy))
 
     def _getNumEmptySpotsPerLine(self, gameState, features):
         """ 
         Feature that gets the number of empty spots per line
         """
-        space = gameState.getStateSpace()
-        for i in range(len(space)):
-            for j in range(len(space[i])):
-                features[str(i)] += 1.0 if space[i][j] == 'empty' else 0.0
-                features[str(j)] += 1.0 if space[i][j] == 'empty' else 0.0
+        empty = ~gameState.getOccupancy()
+        for i, emptyNum in enumerate(np.count_nonzero(empty, axis=1)): # empty spots of each row
+            features[str(i)] += float(emptyNum)
+        for j, emptyNum in enumerate(np.count_nonzero(empty, axis=0)): # empty spots of each column
+            features[str(j)] += float(emptyNum)
 
     def _getLineFeatures(self, gameState, features):
         space = gameState.getStateSpace()
@@ -344,8 +461,8 @@ class TetrisQAgent(ApproximateQAgent):
         reward = self.rewardFunction(previousGameState, gameState) # generate reward
         self.update(previousGameState, self.previousAction, gameState, reward) # do TD update
         
-        if util.flipCoin(self.epsilon):
-            action = random.choice(legalActions)
+        if util.flipCoin(self.epsilon, self.random):
+            action = self.random.choice(legalActions)
         else:
             action = self.computeActionFromQValues(gameState)
         if action is None:
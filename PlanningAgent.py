@@ -0,0 +1,138 @@
+"""
+Expectimax planner over placements. It searches the placements of the
+moving piece and of the preview piece (board.nextPieces), then the expected
+value of the unknown piece that comes after them, and scores the leaves
+with a board evaluator such as the learned weights of a TetrisQAgent.
+"""
+import time
+import util
+from tetrisEngine import pieceNames, directions
+from gameState import gameState
+
+GAME_OVER_VALUE = -1e9 # value of the boards where the game is over
+
+def getAgentEvaluator(agent):
+    '''
+    Returns a leaf evaluator that scores a board with the board features of
+    a TetrisQAgent (getBoardFeatures) and its learned weights. The piece and
+    position features are left out, the next piece is not known when
+    planning. Evaluating never changes the agent's weights, but the
+    planner's cache keeps the values of the weights they were computed
+    with, so clear it if the agent keeps learning.
+    '''
+    def evaluate(board):
+        features = agent.getBoardFeatures(gameState(board, None, directions))
+        return sum(agent.getWeight(feature) * value for feature, value in features.items())
+    return evaluate
+
+class ExpectimaxPlanner():
+    '''
+    Picks a placement for the moving piece. The search deepens one level at
+    a time and returns the best placement of the deepest level finished
+    within timeBudget seconds:
+        1. every placement of the moving piece
+        2. every placement of the preview piece after the beamWidth best
+           boards of level 1
+        3. for the beamWidth best boards of level 2, the average over the 7
+           pieces of the best placement of that piece
+    A board is worth the score gained since the root plus the evaluator's
+    value of its blocks. evaluator(board) must only depend on the board's
+    blocks, as its values are cached by board hash.
+    '''
+
+    def __init__(self, evaluator, beamWidth=4, timeBudget=0.1, cacheSize=65536):
+        self.evaluator = evaluator
+        self.beamWidth = beamWidth
+        self.timeBudget = timeBudget # a level 28 piece takes 40 frames (0.67 secs) to fall through the board
+        self.cache = util.LRUCache(cacheSize) # board hash -> evaluator value
+        self.searchDepth = 0 # deepest level finished by the last plan
+
+    def evaluate(self, board, rootScore):
+        '''
+        Returns the value of a board reached from a root board of score rootScore.
+        '''
+        if board.gameStatus == 'gameOver':
+            return GAME_OVER_VALUE
+        value = self.cache.get(board.boardHash)
+        if value is None:
+            value = self.evaluator(board)
+            self.cache.put(board.boardHash, value)
+        return (board.score - rootScore) + value
+
+    def getSuccessors(self, board):
+        '''
+        Returns (placement, board after the placement) for every placement
+        of the moving piece.
+        '''
+        return [(placement, board.getPlacementSuccessor(placement)) for placement in board.getPlacements()]
+
+    def getExpectedValue(self, board, rootScore, deadline):
+        '''
+        Returns the average over the 7 pieces of the value of the best
+        placement of that piece, as the next piece is not known yet, or
+        None if the deadline passes first.
+        '''
+        if board.gameStatus != 'running':
+            return self.evaluate(board, rootScore)
+        total = 0.0
+        for pieceName in pieceNames:
+            pieceBoard = board.copy()
+            pieceBoard.respawnPiece(pieceName)
+            bestValue = GAME_OVER_VALUE
+            for placement in pieceBoard.getPlacements():
+                if time.perf_counter() > deadline:
+                    return None
+                bestValue = max(bestValue, self.evaluate(pieceBoard.getPlacementSuccessor(placement), rootScore))
+            total += bestValue
+        return total / len(pieceNames)
+
+    def plan(self, board):
+        '''
+        Returns the placement (orientation, column, landing row) to commit
+        for the moving piece of board, or None if it has no placement.
+        The board itself is not changed.
+        '''
+        deadline = time.perf_counter() + self.timeBudget
+        rootScore = board.score
+        self.searchDepth = 0
+
+        # level 1: the moving piece
+        firstMoves = self.getSuccessors(board.copy())
+        if len(firstMoves) == 0:
+            return None
+        firstMoves.sort(key=lambda move: self.evaluate(move[1], rootScore), reverse=True)
+        bestPlacement = firstMoves[0][0]
+        self.searchDepth = 1
+
+        # level 2: the preview piece
+        secondMoves = [] # (first placement, board after the second placement)
+        for placement, firstBoard in firstMoves[:self.beamWidth]:
+            secondPlacements = firstBoard.getPlacements()
+            if len(secondPlacements) == 0: # no preview placement, the game is over
+                secondMoves.append((placement, firstBoard))
+            for secondPlacement in secondPlacements:
+                if time.perf_counter() > deadline:
+                    return bestPlacement
+                secondMoves.append((placement, firstBoard.getPlacementSuccessor(secondPlacement)))
+        secondMoves.sort(key=lambda move: self.evaluate(move[1], rootScore), reverse=True)
+        bestPlacement = secondMoves[0][0]
+        self.searchDepth = 2
+
+        # level 3: expectation over the piece after the preview piece
+        bestValue = None
+        for placement, secondBoard in secondMoves[:self.beamWidth]:
+            value = self.getExpectedValue(secondBoard, rootScore, deadline)
+            if value is None:
+                return bestPlacement
+            if bestValue is None or value > bestValue:
+                bestValue, bestExpectedPlacement = value, placement
+        self.searchDepth = 3
+        return bestExpectedPlacement
+
+    def getPlacement(self, gameState):
+        '''
+        Returns the placement to commit in gameState, see plan.
+        '''
+        if not gameState.isGameRunning():
+            return None
+        return self.plan(gameState.mainBoard.copy(gameState.snapshot))
@@ -0,0 +1,110 @@
+"""
+Experience replay for the Q agents. Transitions are kept in fixed size NumPy
+arrays allocated once, and minibatches are sampled from them uniformly or in
+proportion to their TD errors (prioritised replay). The feature arrays can
+be memory-mapped files, so a buffer larger than the RAM spills to disk.
+"""
+import os
+import numpy as np
+
+class ReplayBuffer():
+    '''
+    Ring of the last capacity transitions (features, action, reward, next
+    features, done). Feature vectors are dense, in the order of the agent's
+    featureIndex, and padded with zeros up to featureNum. The next state is
+    stored as the feature vectors of its actionNum actions, with a mask of
+    the actions that are legal in it.
+    '''
+
+    def __init__(self, capacity, featureNum, actionNum, prioritized=False, alpha=0.6, beta=0.4, memmapPath=None, seed=None):
+        self.capacity = capacity
+        self.featureNum = featureNum
+        self.actionNum = actionNum
+        self.prioritized = prioritized
+        self.alpha = alpha # how much the priorities count, 0 is uniform sampling
+        self.beta = beta # importance sampling correction of prioritised samples, 1 is a full correction
+        self.random = np.random.default_rng(seed)
+
+        self.features = self._allocate(memmapPath, 'features', (capacity, featureNum))
+        self.nextFeatures = self._allocate(memmapPath, 'nextFeatures', (capacity, actionNum, featureNum))
+        self.nextLegal = np.zeros((capacity, actionNum), dtype=bool)
+        self.actions = np.zeros(capacity, dtype=np.int32)
+        self.rewards = np.zeros(capacity, dtype=np.float64)
+        self.dones = np.zeros(capacity, dtype=bool)
+        self.priorities = np.zeros(capacity, dtype=np.float64)
+
+        self.size = 0
+        self.position = 0 # index of the next transition to write
+        self.maxPriority = 1.0
+
+    def _allocate(self, memmapPath, name, shape):
+        '''
+        Returns a float32 array of shape, in a memory-mapped file of
+        memmapPath if given.
+        '''
+        if memmapPath is None:
+            return np.zeros(shape, dtype=np.float32)
+        os.makedirs(memmapPath, exist_ok=True)
+        return np.memmap(os.path.join(memmapPath, name + '.dat'), dtype=np.float32, mode='w+', shape=shape)
+
+    def __len__(self):
+        return self.size
+
+    def add(self, features, action, reward, nextFeatures, nextLegal, done):
+        '''
+        Stores a transition, overwriting the oldest one once the buffer is
+        full. features is a feature vector, nextFeatures a (legal actions,
+        features) matrix and nextLegal the indices of those actions among the
+        actionNum actions. New transitions get the highest priority so far,
+        so they are sampled at least once.
+        '''
+        if len(features) > self.featureNum or (len(nextFeatures) > 0 and nextFeatures.shape[1] > self.featureNum):
+            raise ValueError('more than {} features'.format(self.featureNum))
+        index = self.position
+        self.features[index] = 0
+        self.features[index, :len(features)] = features
+        self.nextFeatures[index] = 0
+        self.nextLegal[index] = False
+        if len(nextLegal) > 0:
+            self.nextFeatures[index, nextLegal, :nextFeatures.shape[1]] = nextFeatures
+            self.nextLegal[index, nextLegal] = True
+        self.actions[index] = action
+        self.rewards[index] = reward
+        self.dones[index] = done
+        self.priorities[index] = self.maxPriority
+        self.position = (self.position + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def sample(self, batchSize):
+        '''
+        Returns a minibatch as (indices, features, actions, rewards,
+        nextFeatures, nextLegal, dones, weights). weights are the importance
+        sampling weights of prioritised samples, all 1 for uniform sampling.
+        '''
+        if self.prioritized:
+            probabilities = self.priorities[:self.size] ** self.alpha
+            probabilities /= probabilities.sum()
+            indices = self.random.choice(self.size, batchSize, p=probabilities)
+            weights = (self.size * probabilities[indices]) ** -self.beta
+            weights /= weights.max()
+        else:
+            indices = self.random.integers(0, self.size, batchSize)
+            weights = np.ones(batchSize)
+        return (indices, self.features[indices], self.actions[indices], self.rewards[indices],
+            self.nextFeatures[indices], self.nextLegal[indices], self.dones[indices], weights)
+
+    def updatePriorities(self, indices, tdErrors, epsilon=1e-6):
+        '''
+        Sets the priorities of sampled transitions to their new TD errors.
+        '''
+        priorities = np.abs(tdErrors) + epsilon
+        self.priorities[indices] = priorities
+        self.maxPriority = max(self.maxPriority, float(priorities.max()))
+
+    def flush(self):
+        '''
+        Writes the memory-mapped arrays to their files.
+        '''
+        for array in (self.features, self.nextFeatures):
+            if isinstance(array, np.memmap):
+                array.flush()
@@ -0,0 +1,89 @@
+"""
+Binary weight files. A weight file is a fixed header, a JSON block with the
+feature names (in weight vector order), the format version and the training
+metadata, then the weights as little-endian float64, aligned to 8 bytes.
+loadWeights maps the weights read-only instead of reading them, so loading
+costs the same for any feature set, and processes that load the same file
+share its pages.
+JSON weight files ({feature name: weight}, like Weight.json) stay available
+to import and export: python WeightFile.py import Weight.json Weight.bin
+                       python WeightFile.py export Weight.bin Weight.json
+"""
+import collections
+import json
+import struct
+import sys
+import numpy as np
+
+WEIGHT_MAGIC = b'TQWT'
+WEIGHT_VERSION = 1
+
+# magic, version, JSON block size, feature number
+weightHeader = struct.Struct('<4sHIQ')
+
+Weights = collections.namedtuple('Weights', ['names', 'vector', 'metadata'])
+
+def saveWeights(path, names, vector, metadata=None):
+    '''
+    Writes a weight file with the weight vector and its feature names.
+    '''
+    vector = np.asarray(vector, dtype='<f8')
+    if len(names) != len(vector):
+        raise ValueError('{} feature names for {} weights'.format(len(names), len(vector)))
+    block = json.dumps({'version': WEIGHT_VERSION, 'names': list(names), 'metadata': metadata or {}}).encode()
+    block += b' ' * (-(weightHeader.size + len(block)) % 8) # the weights start on an 8 byte boundary
+    with open(path, 'wb') as weightFile:
+        weightFile.write(weightHeader.pack(WEIGHT_MAGIC, WEIGHT_VERSION, len(block), len(vector)))
+        weightFile.write(block)
+        weightFile.write(vector.tobytes())
+
+def loadWeights(path):
+    '''
+    Returns the Weights (names, vector, metadata) of a weight file. vector
+    is a read-only memory map of the file, copy it to change the weights.
+    '''
+    with open(path, 'rb') as weightFile:
+        magic, version, blockSize, featureNum = weightHeader.unpack(weightFile.read(weightHeader.size))
+        if magic != WEIGHT_MAGIC:
+            raise ValueError('{} is not a weight file'.format(path))
+        if version != WEIGHT_VERSION:
+            raise ValueError('{} is a version {} weight file, version {} is supported'.format(path, version, WEIGHT_VERSION))
+        block = json.loads(weightFile.read(blockSize))
+    offset = weightHeader.size + blockSize
+    if featureNum == 0:
+        vector = np.zeros(0)
+    else:
+        vector = np.memmap(path, dtype='<f8', mode='r', offset=offset, shape=(featureNum,))
+    return Weights(block['names'], vector, block['metadata'])
+
+def saveWeightDict(path, weights, metadata=None):
+    '''
+    Writes a dict of feature name -> weight (e.g. agent.weights) as a weight file.
+    '''
+    names = list(weights)
+    saveWeights(path, names, [weights[name] for name in names], metadata)
+
+def importJSON(jsonPath, path, metadata=None):
+    '''
+    Converts a JSON weight file to a weight file.
+    '''
+    with open(jsonPath) as json_file:
+        saveWeightDict(path, json.load(json_file), metadata)
+
+def exportJSON(path, jsonPath):
+    '''
+    Converts a weight file to a JSON weight file.
+    '''
+    weights = loadWeights(path)
+    with open(jsonPath, 'w') as json_file:
+        json.dump(dict(zip(weights.names, weights.vector.tolist())), json_file)
+
+if __name__ == '__main__':
+    if len(sys.argv) != 4 or sys.argv[1] not in ('import', 'export'):
+        print('usage: python WeightFile.py import weights.json weights.bin')
+        print('       python WeightFile.py export weights.bin weights.json')
+        sys.exit(2)
+    if sys.argv[1] == 'import':
+        importJSON(sys.argv[2], sys.argv[3])
+    else:
+        exportJSON(sys.argv[2], sys.argv[3])
@@ -0,0 +1,183 @@
+"""
+Cross-entropy weight optimizer. Instead of learning from every frame like
+TetrisQAgent.update, it searches the weights of a placement policy directly:
+each generation samples candidate weight vectors from a Gaussian, plays every
+candidate on the same seeded headless games in a process pool, and refits the
+Gaussian to the best candidates. The policy puts each piece at the placement
+whose board has the highest weighted sum of PLACEMENT_FEATURES.
+The optimizer state is checkpointed after every generation, so a run that is
+stopped resumes where it was, and the mean weights are written as a weight
+file (see WeightFile) with the optimizer's metadata.
+    python WeightOptimizer.py [generations] [OptimizedWeight.bin]
+"""
+import json
+import multiprocessing
+import os
+import sys
+import time
+import numpy as np
+import boardFeatures
+import tetrisEngine
+import WeightFile
+
+# boardFeatures of the board after a placement, then the lines it cleared
+PLACEMENT_FEATURES = ('aggregateHeight', 'maxHeight', 'holes', 'bumpiness', 'rowTransitions', 'colTransitions', 'wells', 'clearedLines')
+
+def getPlacementFeatures(board, successors):
+    '''
+    Returns the (successor number, len(PLACEMENT_FEATURES)) feature array of
+    the boards after the placements of board's moving piece.
+    '''
+    occupancy = np.array([successor.getBlockMat() for successor in successors]) != 'empty'
+    features = boardFeatures.getBatchFeatures(occupancy)
+    columns = [features[name] for name in PLACEMENT_FEATURES[:-1]]
+    columns.append([successor.lines - board.lines for successor in successors])
+    return np.column_stack(columns).astype(np.float64)
+
+def getWeightEvaluator(weights):
+    '''
+    Returns an ExpectimaxPlanner evaluator for the Weights of an optimizer
+    weight file. The clearedLines weight is left out, the planner counts
+    the score of the cleared lines itself.
+    '''
+    vector = np.array(weights.vector, dtype=np.float64)
+    vector[list(weights.names).index('clearedLines')] = 0.0
+    def evaluate(board):
+        return float(getPlacementFeatures(board, [board])[0] @ vector)
+    return evaluate
+
+def playGame(vector, seed, maxPieces, colNum=10, rowNum=20):
+    '''
+    Plays a headless game with the pieces of seed, placing every piece
+    where the weights of vector value the board the most, and returns the
+    number of lines cleared once the game is over or maxPieces are placed.
+    '''
+    board = tetrisEngine.MainBoard(colNum, rowNum, pieceGenerator=tetrisEngine.PieceGenerator(seed), startingLevel=0)
+    board.restart()
+    for pieceNum in range(maxPieces):
+        placements = board.getPlacements()
+        if len(placements) == 0: # game over
+            break
+        successors = [board.getPlacementSuccessor(placement) for placement in placements]
+        values = getPlacementFeatures(board, successors) @ vector
+        values[[successor.gameStatus == 'gameOver' for successor in successors]] = -np.inf
+        board = successors[int(np.argmax(values))]
+    return board.lines
+
+def _playGame(args): # pool workers get one (vector, seed, maxPieces, colNum, rowNum) tuple
+    return playGame(*args)
+
+class CrossEntropyOptimizer():
+    '''
+    Cross-entropy method over a diagonal Gaussian of weight vectors. Every
+    generation plays populationSize candidates on gamesPerCandidate new
+    seeds, moves the mean and the deviations to those of the eliteFraction
+    best candidates, then plays the new mean on the same seeds. noise is added to the
+    variances so the search does not collapse early, and decays by
+    noiseDecay every generation.
+    '''
+
+    def __init__(self, path, populationSize=50, eliteFraction=0.2, gamesPerCandidate=4, maxPieces=500,
+            initialStd=10.0, noise=4.0, noiseDecay=0.95, seed=0, processes=None, colNum=10, rowNum=20):
+        self.path = path # weight file of the mean weights
+        self.statePath = path + '.state' # optimizer checkpoint
+        self.populationSize = populationSize
+        self.eliteNum = max(1, int(round(populationSize * eliteFraction)))
+        self.gamesPerCandidate = gamesPerCandidate
+        self.maxPieces = maxPieces # bounds the length of a game, good weights never lose
+        self.noise = noise
+        self.noiseDecay = noiseDecay
+        self.processes = processes # None uses every core
+        self.colNum = colNum
+        self.rowNum = rowNum
+
+        self.random = np.random.default_rng(seed)
+        self.mean = np.zeros(len(PLACEMENT_FEATURES))
+        self.std = np.full(len(PLACEMENT_FEATURES), initialStd)
+        self.generation = 0
+        self.history = [] # (generation, mean fitness, best candidate fitness, fitness of the refit mean weights)
+        if os.path.exists(self.statePath):
+            self.loadState()
+
+    def loadState(self):
+        '''
+        Resumes from the checkpoint of the last finished generation.
+        '''
+        with open(self.statePath) as stateFile:
+            state = json.load(stateFile)
+        if state['features'] != list(PLACEMENT_FEATURES):
+            raise ValueError('{} was written for the features {}'.format(self.statePath, state['features']))
+        self.mean = np.array(state['mean'])
+        self.std = np.array(state['std'])
+        self.generation = state['generation']
+        self.history = [tuple(entry) for entry in state['history']]
+        self.random.bit_generator.state = state['random']
+
+    def saveState(self):
+        '''
+        Writes the checkpoint and the weight file of the mean weights, each
+        next to its destination and then renamed over it.
+        '''
+        state = {
+            'features': list(PLACEMENT_FEATURES),
+            'mean': self.mean.tolist(),
+            'std': self.std.tolist(),
+            'generation': self.generation,
+            'history': self.history,
+            'random': self.random.bit_generator.state,
+        }
+        with open(self.statePath + '.tmp', 'w') as stateFile:
+            json.dump(state, stateFile)
+        metadata = {
+            'optimizer': 'crossEntropy',
+            'generation': self.generation,
+            'fitness': self.history[-1][3] if self.history else None, # lines per game of these mean weights
+            'gamesPerCandidate': self.gamesPerCandidate,
+            'maxPieces': self.maxPieces,
+        }
+        WeightFile.saveWeights(self.path + '.tmp', PLACEMENT_FEATURES, self.mean, metadata)
+        os.replace(self.path + '.tmp', self.path)
+        os.replace(self.statePath + '.tmp', self.statePath)
+
+    def evaluate(self, pool, candidates, seeds):
+        '''
+        Returns the lines per game of every candidate over the same seeds,
+        so all candidates of a generation play the same pieces.
+        '''
+        games = [(candidate, seed, self.maxPieces, self.colNum, self.rowNum) for candidate in candidates for seed in seeds]
+        lines = pool.map(_playGame, games, chunksize=1) # one game per task keeps every core busy to the end
+        return np.array(lines, dtype=np.float64).reshape(len(candidates), len(seeds)).mean(axis=1)
+
+    def step(self, pool):
+        '''
+        Runs one generation and checkpoints it.
+        '''
+        candidates = self.mean + self.std * self.random.standard_normal((self.populationSize, len(self.mean)))
+        seeds = self.random.integers(2 ** 31, size=self.gamesPerCandidate).tolist()
+        fitness = self.evaluate(pool, candidates, seeds)
+        elite = candidates[np.argsort(fitness)[::-1][:self.eliteNum]]
+        self.mean = elite.mean(axis=0)
+        extraNoise = self.noise * self.noiseDecay ** self.generation
+        self.std = np.sqrt(elite.var(axis=0) + extraNoise)
+        meanFitness = self.evaluate(pool, [self.mean], seeds)[0] # the weights written with this generation
+        self.generation += 1
+        self.history.append((self.generation, float(fitness.mean()), float(fitness.max()), float(meanFitness)))
+        self.saveState()
+
+    def run(self, generations):
+        '''
+        Runs generations more generations and returns the mean weights.
+        '''
+        with multiprocessing.Pool(self.processes) as pool:
+            for i in range(generations):
+                startTime = time.perf_counter()
+                self.step(pool)
+                generation, averageLines, bestLines, meanLines = self.history[-1]
+                print('generation {}: {:.1f} lines per game, best {:.1f}, mean weights {:.1f} ({:.1f}s)'.format(
+                    generation, averageLines, bestLines, meanLines, time.perf_counter() - startTime))
+        return dict(zip(PLACEMENT_FEATURES, self.mean.tolist()))
+
+if __name__ == '__main__':
+    generations = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    path = sys.argv[2] if len(sys.argv) > 2 else 'OptimizedWeight.bin'
+    print(CrossEntropyOptimizer(path).run(generations))
@@ -0,0 +1,336 @@
+#Batch Tetris engine: N boards stored in one (N, rowNum, colNum) uint8 NumPy array and stepped in lockstep
+#Every board follows the same frame rules as tetrisEngine.MainBoard.stepAction, but each game phase
+#(move, fall, rotate, lock, line clear, spawn) is applied to all the boards in that phase at once
+
+import numpy as np
+from tetrisEngine import pieceNames, pieceOrientations, directions, levelSpeeds, baseLinePoints, actionNames, STARTING_LEVEL, MOVE_PERIOD_INIT, CLEAR_ANI_PERIOD
+
+#Block offsets of every orientation, orientationCells[pieceType][orientation][block] = (row, col)
+#Piece types are indices in pieceNames, board cells hold pieceType + 1 (0 is an empty cell)
+orientationCells = np.array([pieceOrientations[pieceName] for pieceName in pieceNames], dtype=np.int64)
+O_PIECE = pieceNames.index('O')
+
+moveNames = ('noMove', 'down', 'right', 'left', 'downRight', 'downLeft')
+NO_MOVE, DOWN, RIGHT, LEFT, DOWN_RIGHT, DOWN_LEFT = range(len(moveNames))
+moveRows = np.array([directions[moveName][0] for moveName in moveNames], dtype=np.int64)
+moveCols = np.array([directions[moveName][1] for moveName in moveNames], dtype=np.int64)
+dropMoves = np.array([moveName in ('down', 'downRight', 'downLeft') for moveName in moveNames]) #Moves that add to the drop score
+
+actionCodes = dict((actionName, code) for code, actionName in enumerate(actionNames))
+actionDown = np.array([actionName in ('down', 'downRight', 'downLeft') for actionName in actionNames])
+actionXNav = np.array([1 if actionName in ('right', 'downRight') else -1 if actionName in ('left', 'downLeft') else 0 for actionName in actionNames], dtype=np.int8)
+R_ROTATE = actionCodes['R_rotate']
+L_ROTATE = actionCodes['L_rotate']
+RESTART = actionCodes['restart']
+
+#Status codes, in the same order as the status strings of MainBoard, MovingPiece and GameKeyInput
+FIRST_START, RUNNING, GAME_OVER = 0, 1, 2 # gameStatus
+UNCREATED, MOVING, COLLIDED = 0, 1, 2 # pieceStatus
+IDLE, CLEAR_RUNNING, CLEARED = 0, 1, 2 # lineClearStatus
+KEY_IDLE, KEY_PRESSED, KEY_RELEASED = 0, 1, 2 # key statuses
+
+levelSpeedArray = np.array(levelSpeeds, dtype=np.int64)
+baseLinePointArray = np.array(baseLinePoints, dtype=np.int64)
+
+class BatchTetris:
+
+	def __init__(self,boardNum,colNum=10,rowNum=20,seed=None):
+
+		self.boardNum = boardNum
+		self.colNum = colNum
+		self.rowNum = rowNum
+		self.rng = np.random.default_rng(seed)
+
+		self.blockMat = np.zeros((boardNum,rowNum,colNum), dtype=np.uint8)
+
+		#Moving piece
+		self.pieceType = np.zeros(boardNum, dtype=np.int64)
+		self.orientation = np.zeros(boardNum, dtype=np.int64)
+		self.originRow = np.zeros(boardNum, dtype=np.int64)
+		self.originCol = np.zeros(boardNum, dtype=np.int64)
+		self.pieceStatus = np.full(boardNum, UNCREATED, dtype=np.int8)
+		self.gameOverCondition = np.zeros(boardNum, dtype=bool)
+		self.dropScore = np.zeros(boardNum, dtype=np.int64)
+		self.lastMove = np.full(boardNum, NO_MOVE, dtype=np.int64)
+
+		#Board
+		self.lineClearStatus = np.full(boardNum, IDLE, dtype=np.int8)
+		self.clearedLines = np.full((boardNum,4), -1, dtype=np.int64)
+		self.gameStatus = np.full(boardNum, FIRST_START, dtype=np.int8)
+		self.nextPieces = np.zeros((boardNum,2), dtype=np.int64)
+		self.score = np.zeros(boardNum, dtype=np.int64)
+		self.level = np.full(boardNum, STARTING_LEVEL, dtype=np.int64)
+		self.lines = np.zeros(boardNum, dtype=np.int64)
+
+		#Clock
+		self.frameTick = np.zeros(boardNum, dtype=np.int64)
+		self.movePreFrame = np.zeros(boardNum, dtype=np.int64)
+		self.fallPreFrame = np.zeros(boardNum, dtype=np.int64)
+		self.fallPeriod = np.full(boardNum, levelSpeeds[STARTING_LEVEL], dtype=np.int64)
+		self.clearAniStart = np.zeros(boardNum, dtype=np.int64)
+
+		#Keys
+		self.xNav = np.zeros(boardNum, dtype=np.int8) # 1 right, -1 left
+		self.downStatus = np.full(boardNum, KEY_IDLE, dtype=np.int8)
+		self.rotateStatus = np.full(boardNum, KEY_IDLE, dtype=np.int8)
+		self.rotateTrig = np.zeros(boardNum, dtype=bool)
+		self.cRotateStatus = np.full(boardNum, KEY_IDLE, dtype=np.int8)
+		self.cRotateTrig = np.zeros(boardNum, dtype=bool)
+		self.enterStatus = np.full(boardNum, KEY_IDLE, dtype=np.int8)
+
+	def actionArray(self,actions): #Converts a list of action names (or an array of action codes) to an array of action codes
+		if isinstance(actions, np.ndarray) and actions.dtype.kind in 'iu':
+			return actions
+		return np.array([actionCodes[action] for action in actions], dtype=np.int64)
+
+	# One frame of every board, actions holds one action per board
+	def step(self,actions):
+
+		actions = self.actionArray(actions)
+		self.pressActions(actions)
+		self.gameAction()
+		self.releaseActions(actions)
+		self.frameTick += 1
+
+	def pressActions(self,actions): #Same key changes as GameKeyInput.pressAction
+		self.downStatus[actionDown[actions]] = KEY_PRESSED
+		self.xNav[:] = actionXNav[actions]
+		rotate = (actions == R_ROTATE) & (self.rotateStatus == KEY_IDLE)
+		self.rotateTrig[rotate] = True
+		self.rotateStatus[rotate] = KEY_PRESSED
+		cRotate = (actions == L_ROTATE) & (self.cRotateStatus == KEY_IDLE)
+		self.cRotateTrig[cRotate] = True
+		self.cRotateStatus[cRotate] = KEY_PRESSED
+		self.enterStatus[actions == RESTART] = KEY_PRESSED
+
+	def releaseActions(self,actions): #Same key changes as GameKeyInput.releaseAction
+		self.downStatus[actionDown[actions]] = KEY_RELEASED
+		self.xNav[:] = 0
+		self.rotateStatus[actions == R_ROTATE] = KEY_IDLE
+		self.cRotateStatus[actions == L_ROTATE] = KEY_IDLE
+		self.enterStatus[actions == RESTART] = KEY_IDLE
+
+	# Same phases as MainBoard.gameAction, each applied to the indices of the boards in that phase
+	def gameAction(self):
+
+		running = np.flatnonzero(self.gameStatus == RUNNING)
+		self.restart(np.flatnonzero((self.gameStatus != RUNNING) & (self.enterStatus == KEY_PRESSED)))
+
+		self.movePieces(running)
+		self.checkAndApplyGameOver(running)
+
+		running = running[self.gameStatus[running] != GAME_OVER]
+		moving = running[self.pieceStatus[running] == MOVING]
+		self.rotatePieces(moving,self.rotateTrig,1)
+		self.rotatePieces(moving,self.cRotateTrig,-1)
+
+		collided = running[self.pieceStatus[running] == COLLIDED]
+		clearStatus = self.lineClearStatus[collided]
+		clearRunning = collided[clearStatus == CLEAR_RUNNING]
+		cleared = collided[clearStatus == CLEARED]
+		self.lockPieces(collided[clearStatus == IDLE])
+		self.lineClearAnimation(clearRunning)
+		self.dropFreeBlocks(cleared)
+		self.prepareNextSpawn(cleared)
+
+	def drawPieces(self,boards): #Random piece types for the given boards
+		return self.rng.integers(0,len(pieceNames),size=len(boards))
+
+	def restart(self,boards):
+
+		self.blockMat[boards] = 0
+		self.pieceStatus[boards] = UNCREATED
+		self.orientation[boards] = 0
+		self.originRow[boards] = 0
+		self.originCol[boards] = 0
+		self.gameOverCondition[boards] = False
+		self.dropScore[boards] = 0
+		self.lastMove[boards] = NO_MOVE
+
+		self.lineClearStatus[boards] = IDLE
+		self.clearedLines[boards] = -1
+		self.nextPieces[boards,0] = self.drawPieces(boards)
+		self.nextPieces[boards,1] = self.drawPieces(boards)
+		self.pieceType[boards] = self.nextPieces[boards,0]
+		self.gameStatus[boards] = RUNNING
+
+		self.score[boards] = 0
+		self.level[boards] = STARTING_LEVEL
+		self.lines[boards] = 0
+
+		self.frameTick[boards] = 0
+		self.movePreFrame[boards] = 0
+		self.fallPreFrame[boards] = 0
+		self.fallPeriod[boards] = levelSpeeds[STARTING_LEVEL]
+		self.clearAniStart[boards] = 0
+
+	def pieceCells(self,boards,orientation,originRow,originCol): #Rows and columns of the 4 blocks of the pieces, shape (len(boards), 4)
+		cells = orientationCells[self.pieceType[boards],orientation]
+		return originRow[:,None] + cells[:,:,0], originCol[:,None] + cells[:,:,1]
+
+	def collisionCheck(self,boards,orientation,originRow,originCol): #Same check as MovingPiece.collisionCheck for all the given boards
+		rows, cols = self.pieceCells(boards,orientation,originRow,originCol)
+		outside = (rows < 0) | (rows > self.rowNum-1) | (cols < 0) | (cols > self.colNum-1)
+		occupied = self.blockMat[boards[:,None],rows.clip(0,self.rowNum-1),cols.clip(0,self.colNum-1)] != 0
+		return (outside | occupied).any(axis=1)
+
+	def movCollisionCheck(self,boards,moves):
+		return self.collisionCheck(boards,self.orientation[boards],self.originRow[boards]+moveRows[moves],self.originCol[boards]+moveCols[moves])
+
+	def spawn(self,boards):
+
+		self.dropScore[boards] = 0
+		self.orientation[boards] = 0
+		self.originRow[boards] = 0
+		self.originCol[boards] = 3
+
+		trying = boards
+		for spawnTry in range(0,2):
+			rows, cols = self.pieceCells(trying,self.orientation[trying],self.originRow[trying],self.originCol[trying])
+			occupied = (rows >= 0) & (self.blockMat[trying[:,None],rows.clip(0,None),cols] != 0)
+			trying = trying[occupied.any(axis=1)]
+			self.originRow[trying] -= 1
+			self.gameOverCondition[trying] = True
+			self.pieceStatus[trying] = COLLIDED
+
+	def movePieces(self,boards): #Same as MovingPiece.move
+
+		pieceStatus = self.pieceStatus[boards]
+		uncreated = boards[pieceStatus == UNCREATED]
+		moving = boards[pieceStatus == MOVING]
+		self.pieceStatus[uncreated] = MOVING
+		self.spawn(uncreated)
+
+		downStatus = self.downStatus[moving]
+		pressed = moving[downStatus == KEY_PRESSED]
+		idle = moving[downStatus == KEY_IDLE]
+		self.downStatus[moving[downStatus == KEY_RELEASED]] = KEY_IDLE
+
+		#Down key pressed: move down (and sideways if possible), or collide
+		xNav = self.xNav[pressed]
+		downCollision = self.movCollisionCheck(pressed,DOWN)
+		diagonalMove = np.where(xNav > 0, DOWN_RIGHT, np.where(xNav < 0, DOWN_LEFT, DOWN))
+		diagonalCollision = self.movCollisionCheck(pressed,diagonalMove)
+		self.lastMove[pressed] = np.where(downCollision, NO_MOVE, np.where(diagonalCollision, DOWN, diagonalMove))
+		self.pieceStatus[pressed[downCollision]] = COLLIDED
+		self.applyFastMove(pressed)
+
+		#Down key idle: move sideways if possible, then free fall
+		xNav = self.xNav[idle]
+		sideMove = np.where(xNav > 0, RIGHT, np.where(xNav < 0, LEFT, NO_MOVE))
+		sideCollision = self.movCollisionCheck(idle,sideMove)
+		self.lastMove[idle] = np.where(sideCollision, NO_MOVE, sideMove)
+		self.applyFastMove(idle)
+		self.slowMoveAction(idle)
+
+	def applyFastMove(self,boards):
+
+		boards = boards[self.frameTick[boards] - self.movePreFrame[boards] > MOVE_PERIOD_INIT - 1]
+		self.movePreFrame[boards] = self.frameTick[boards]
+		lastMove = self.lastMove[boards]
+		self.dropScore[boards] += dropMoves[lastMove]
+		self.originRow[boards] += moveRows[lastMove]
+		self.originCol[boards] += moveCols[lastMove]
+
+	def slowMoveAction(self,boards):
+
+		boards = boards[self.frameTick[boards] - self.fallPreFrame[boards] > self.fallPeriod[boards] - 1]
+		self.fallPreFrame[boards] = self.frameTick[boards]
+		downCollision = self.movCollisionCheck(boards,DOWN)
+		self.lastMove[boards] = np.where(downCollision, NO_MOVE, DOWN)
+		self.pieceStatus[boards[downCollision]] = COLLIDED
+		self.originRow[boards[~downCollision]] += 1
+
+	def rotatePieces(self,boards,trig,rotation): #Rotates the pieces of the boards with a triggered rotation key, rotation is 1 for CW and -1 for cCW
+
+		boards = boards[trig[boards]]
+		trig[boards] = False
+		boards = boards[self.pieceType[boards] != O_PIECE]
+		nextOrientation = (self.orientation[boards] + rotation) % 4
+		collision = self.collisionCheck(boards,nextOrientation,self.originRow[boards],self.originCol[boards])
+		self.orientation[boards[~collision]] = nextOrientation[~collision]
+
+	def placePieces(self,boards): #Writes the blocks of the pieces into the boards, blocks above the board are skipped
+		rows, cols = self.pieceCells(boards,self.orientation[boards],self.originRow[boards],self.originCol[boards])
+		inside = rows >= 0
+		boardIndex = np.broadcast_to(boards[:,None],rows.shape)
+		self.blockMat[boardIndex[inside],rows[inside],cols[inside]] = (self.pieceType[boards,None] + 1).repeat(4,axis=1)[inside]
+		return rows
+
+	def checkAndApplyGameOver(self,boards):
+
+		boards = boards[self.gameOverCondition[boards]]
+		self.gameStatus[boards] = GAME_OVER
+		self.placePieces(boards)
+
+	def lockPieces(self,boards): #Lock, getCompleteLines, updateScores and updateSpeed of MainBoard.gameAction
+
+		rows = self.placePieces(boards)
+
+		#Cleared lines are the distinct full rows of the locked piece, from the bottom row up
+		full = (self.blockMat[boards[:,None],rows] != 0).all(axis=2)
+		clearedLines = -np.sort(-np.where(full, rows, -1), axis=1)
+		clearedLines[:,1:][clearedLines[:,1:] == clearedLines[:,:-1]] = -1
+		clearedLines = -np.sort(-clearedLines, axis=1)
+		self.clearedLines[boards] = clearedLines
+		clearedLinesNum = (clearedLines >= 0).sum(axis=1)
+
+		clearing = clearedLinesNum > 0
+		self.clearAniStart[boards[clearing]] = self.frameTick[boards[clearing]]
+		self.lineClearStatus[boards[clearing]] = CLEAR_RUNNING
+		self.prepareNextSpawn(boards[~clearing])
+
+		score = self.score[boards] + (self.level[boards]+1)*baseLinePointArray[clearedLinesNum] + self.dropScore[boards]
+		self.score[boards] = np.minimum(score, 999999)
+		self.lines[boards] += clearedLinesNum
+		self.level[boards] = np.minimum(STARTING_LEVEL + self.lines[boards]//10, 99)
+
+		level = self.level[boards]
+		fallPeriod = np.where(level < 29, levelSpeedArray[np.minimum(level,28)], 1)
+		self.fallPeriod[boards] = np.where(fallPeriod < 4, MOVE_PERIOD_INIT, fallPeriod)
+
+	def lineClearAnimation(self,boards):
+
+		clearAniStage = (self.frameTick[boards] - self.clearAniStart[boards]) // CLEAR_ANI_PERIOD
+		halfCol = self.colNum // 2
+		animating = clearAniStage < halfCol
+		self.lineClearStatus[boards[~animating]] = CLEARED
+
+		boards = boards[animating]
+		clearAniStage = clearAniStage[animating]
+		clearedLines = self.clearedLines[boards]
+		cleared = clearedLines >= 0
+		boardIndex = np.broadcast_to(boards[:,None],clearedLines.shape)[cleared]
+		rows = clearedLines[cleared]
+		stage = np.broadcast_to(clearAniStage[:,None],clearedLines.shape)[cleared]
+		self.blockMat[boardIndex,rows,halfCol+stage] = 0
+		self.blockMat[boardIndex,rows,(halfCol-1)-stage] = 0
+
+	def dropFreeBlocks(self,boards):
+
+		#Stable sort of the rows on "kept": the cleared rows come first and are emptied, the kept rows keep their order below them
+		kept = np.ones((len(boards),self.rowNum), dtype=bool)
+		clearedLines = self.clearedLines[boards]
+		cleared = clearedLines >= 0
+		kept[np.broadcast_to(np.arange(len(boards))[:,None],clearedLines.shape)[cleared],clearedLines[cleared]] = False
+		order = np.argsort(kept, axis=1, kind='stable')
+		blockMat = np.take_along_axis(self.blockMat[boards],order[:,:,None],axis=1)
+		blockMat[np.arange(self.rowNum)[None,:] < cleared.sum(axis=1)[:,None]] = 0
+		self.blockMat[boards] = blockMat
+
+	def prepareNextSpawn(self,boards):
+
+		self.nextPieces[boards,0] = self.nextPieces[boards,1]
+		self.nextPieces[boards,1] = self.drawPieces(boards)
+		self.pieceType[boards] = self.nextPieces[boards,0]
+		self.lineClearStatus[boards] = IDLE
+		self.pieceStatus[boards] = UNCREATED
+
+	def getBlockMat(self,board): #blockMat of one board as MainBoard stores it, a list of rows of piece names or 'empty'
+		cellNames = ('empty',) + pieceNames
+		return [[cellNames[cell] for cell in row] for row in self.blockMat[board].tolist()]
+
+	def getPieceCells(self,board): #(row, col) of the 4 blocks of the moving piece of one board
+		boards = np.array([board])
+		rows, cols = self.pieceCells(boards,self.orientation[boards],self.originRow[boards],self.originCol[boards])
+		return list(zip(rows[0].tolist(), cols[0].tolist()))
@@ -0,0 +1,76 @@
+"""
+Board evaluation features computed with NumPy over array boards.
+A board is a (rowNum, colNum) array in which nonzero (or True) cells hold a
+block, row 0 being the top row, like tetrisEnv.ArrayBoard.blockArray and the
+boards of batchTetris. getBatchFeatures takes a (boardNum, rowNum, colNum)
+stack of boards, e.g. every candidate placement of a piece, and computes the
+features of all of them in one pass.
+"""
+import numpy as np
+
+def getOccupancy(space):
+    '''
+    Returns the bool occupancy array of a blockMat style board (lists of
+    piece types and 'empty'), e.g. gameState.getStateSpace().
+    '''
+    return np.array(space) != 'empty'
+
+def getBatchFeatures(boards):
+    '''
+    Returns a dict of features for a (boardNum, rowNum, colNum) stack of
+    boards, every value having one entry per board:
+        colHeights      (boardNum, colNum) height of every column
+        aggregateHeight sum of the column heights
+        maxHeight       height of the highest column
+        holes           empty cells with a block above them in their column
+        bumpiness       sum of the height differences of adjacent columns
+        rowTransitions  filled/empty changes along the rows, walls are filled
+        colTransitions  filled/empty changes along the columns, the floor is filled
+        wellDepths      (boardNum, colNum) depth of every column below its
+                        lowest neighbour, the walls being infinitely high
+        wells           sum of the well depths
+        completedLines  number of full rows
+    '''
+    filled = np.asarray(boards) != 0
+    boardNum, rowNum, colNum = filled.shape
+
+    hasBlock = filled.any(axis=1)
+    colHeights = np.where(hasBlock, rowNum - filled.argmax(axis=1), 0)
+
+    covered = np.logical_or.accumulate(filled, axis=1) # cells at or below the top of their column
+    holes = np.count_nonzero(covered & ~filled, axis=(1, 2))
+
+    bumpiness = np.abs(np.diff(colHeights, axis=1)).sum(axis=1)
+
+    walls = np.ones((boardNum, rowNum, 1), dtype=bool)
+    rowCells = np.concatenate((walls, filled, walls), axis=2)
+    rowTransitions = np.count_nonzero(rowCells[:, :, 1:] != rowCells[:, :, :-1], axis=(1, 2))
+    colTransitions = np.count_nonzero(filled[:, 1:, :] != filled[:, :-1, :], axis=(1, 2)) + np.count_nonzero(~filled[:, -1, :], axis=1)
+
+    wallHeights = np.full((boardNum, 1), rowNum + 1)
+    neighbourHeights = np.concatenate((wallHeights, colHeights, wallHeights), axis=1)
+    wellDepths = np.maximum(np.minimum(neighbourHeights[:, :-2], neighbourHeights[:, 2:]) - colHeights, 0)
+    wellDepths[wellDepths > rowNum] = 0 # a column between two walls is not a well
+
+    return {
+        'colHeights': colHeights,
+        'aggregateHeight': colHeights.sum(axis=1),
+        'maxHeight': colHeights.max(axis=1),
+        'holes': holes,
+        'bumpiness': bumpiness,
+        'rowTransitions': rowTransitions,
+        'colTransitions': colTransitions,
+        'wellDepths': wellDepths,
+        'wells': wellDepths.sum(axis=1),
+        'completedLines': np.count_nonzero(filled.all(axis=2), axis=1),
+    }
+
+def getBoardFeatures(board):
+    '''
+    Returns the features of getBatchFeatures for a single (rowNum, colNum)
+    board, as ints and (colNum,) arrays.
+    '''
+    features = getBatchFeatures(np.asarray(board)[np.newaxis])
+    for name in features:
+        features[name] = features[name][0] if features[name].ndim > 1 else int(features[name][0])
+    return features
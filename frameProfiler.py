@@ -0,0 +1,103 @@
+#Per-phase frame timings for tetris.gameLoop, enabled with "python tetris.py --profile"
+#Every frame the time between two marks is added to the phase of the second mark, then at the end of the frame each phase's total
+#goes into a latency histogram. The histograms are printed (p50, p95, p99, max and mean per phase) every dumpInterval frames
+#and started over, so each dump describes the last frames. Without a profiler the marks of gameLoop are skipped by a None check
+
+import math, sys, time
+
+HISTOGRAM_MIN_EXP = -23 #Smallest bucket is about 0.1 microseconds
+HISTOGRAM_MAX_EXP = 8 #Largest bucket is about 2 minutes
+SUB_BUCKETS = 8 #Buckets per power of 2, a bucket is at most 1/8 of its value wide
+BUCKET_NUM = (HISTOGRAM_MAX_EXP - HISTOGRAM_MIN_EXP) * SUB_BUCKETS
+
+#Phases of a gameLoop frame, in order
+FRAME_PHASES = ('observe','chooseAction','pressButton','events','releaseButton','gameAction','draw','displayUpdate','tick')
+
+
+class LatencyHistogram:
+
+	#Durations are counted in log-spaced buckets, so adding one is a few operations and percentiles are within 1/8 of their value
+	def __init__(self):
+		self.reset()
+
+	def reset(self):
+		self.counts = [0] * BUCKET_NUM
+		self.count = 0
+		self.total = 0.0
+		self.max = 0.0
+
+	def add(self,seconds):
+		if seconds > 0:
+			mantissa, exponent = math.frexp(seconds) #seconds = mantissa * 2**exponent, 0.5 <= mantissa < 1
+			index = (exponent - HISTOGRAM_MIN_EXP) * SUB_BUCKETS + int((mantissa - 0.5) * 2 * SUB_BUCKETS)
+			index = min(max(index,0),BUCKET_NUM - 1)
+		else: #Phases that did not run in a frame
+			index = 0
+		self.counts[index] += 1
+		self.count += 1
+		self.total += seconds
+		if seconds > self.max:
+			self.max = seconds
+
+	def bucketLimit(self,index): #Upper limit of a bucket in seconds
+		exponent, subBucket = divmod(index,SUB_BUCKETS)
+		return (0.5 + (subBucket + 1) / (2 * SUB_BUCKETS)) * 2.0 ** (exponent + HISTOGRAM_MIN_EXP)
+
+	def percentile(self,p): #Upper limit of the bucket holding the p-th percentile (0 to 100), never above the max
+		if self.count == 0:
+			return 0.0
+		rank = math.ceil(self.count * p / 100)
+		seen = 0
+		for index, count in enumerate(self.counts):
+			seen += count
+			if seen >= rank:
+				return min(self.bucketLimit(index),self.max)
+		return self.max
+
+	def mean(self):
+		return self.total / self.count if self.count > 0 else 0.0
+
+
+class FrameProfiler:
+
+	def __init__(self,phases=FRAME_PHASES,dumpInterval=600,output=None):
+		self.phases = phases
+		self.dumpInterval = dumpInterval #Frames between two dumps, 600 frames are 10 seconds at 60 fps
+		self.output = output #Stream the dumps are written to, sys.stderr by default
+		self.histograms = dict((phase, LatencyHistogram()) for phase in phases)
+		self.frameHistogram = LatencyHistogram() #Whole frames, from one startFrame to the next
+		self.frameTimes = dict((phase, 0.0) for phase in phases) #Time of every phase in the current frame
+		self.frameNum = 0
+		self.frameStart = None
+		self.lastMark = None
+
+	def startFrame(self): #Called first thing in a frame, ends the previous frame
+		now = time.perf_counter()
+		if self.frameStart is not None:
+			self.endFrame(now)
+		self.frameStart = now
+		self.lastMark = now
+
+	def mark(self,phase): #Adds the time since the last mark to phase, a phase may be marked several times per frame
+		now = time.perf_counter()
+		self.frameTimes[phase] += now - self.lastMark
+		self.lastMark = now
+
+	def endFrame(self,now):
+		for phase in self.phases:
+			self.histograms[phase].add(self.frameTimes[phase])
+			self.frameTimes[phase] = 0.0
+		self.frameHistogram.add(now - self.frameStart)
+		self.frameNum += 1
+		if self.frameNum % self.dumpInterval == 0:
+			self.dump()
+
+	def dump(self): #Writes the percentiles of the frames since the last dump and starts the histograms over
+		output = self.output if self.output is not None else sys.stderr
+		output.write('frames {}-{} (milliseconds):\n'.format(self.frameNum - self.frameHistogram.count + 1,self.frameNum))
+		output.write('{:14} {:>8} {:>8} {:>8} {:>8} {:>8}\n'.format('phase','p50','p95','p99','max','mean'))
+		for phase, histogram in list(self.histograms.items()) + [('frame',self.frameHistogram)]:
+			output.write('{:14} {:8.3f} {:8.3f} {:8.3f} {:8.3f} {:8.3f}\n'.format(phase,
+				histogram.percentile(50)*1e3,histogram.percentile(95)*1e3,histogram.percentile(99)*1e3,histogram.max*1e3,histogram.mean()*1e3))
+			histogram.reset()
+		output.flush()
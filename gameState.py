@@ -1,24 +1,47 @@
-import copy
+import util
+import boardFeatures
+
+HISTORY_DEPTH = 8 # number of observations kept in a state's history
+
 class gameState():
     """
-    Class that defines what a gameState is consisted of
+    Class that defines what a gameState is consisted of.
+    A gameState is an observation record: it keeps a snapshot of the board
+    taken when it was created, not references to the live board's blocks
+    and piece, so it still describes its own frame once the game moves on.
     """
-    def __init__(self, mainBoard, previousGameStatesList, directions):
+    def __init__(self, mainBoard, previousGameStatesList, directions, historyDepth=HISTORY_DEPTH):
         self.mainBoard = mainBoard
-        self.space = mainBoard.blockMat
-        self.piece = mainBoard.piece
+        self.snapshot = mainBoard.snapshot()
+        self.space = mainBoard.getBlockMat(self.snapshot) # blocks of the snapshot, piece names or 'empty'
+        self.pieceType = mainBoard.piece.type
+        self.lastMoveType = mainBoard.piece.lastMoveType
+        self.colNum = mainBoard.colNum
+        self.rowNum = mainBoard.rowNum
         self.score = mainBoard.score
         self.level = mainBoard.level
         self.lines = mainBoard.lines
-        self.nextPieces = mainBoard.nextPieces
-        self.previousObservations = previousGameStatesList 
+        self.nextPieces = mainBoard.nextPieces[:]
+        if previousGameStatesList is None: # first observation, start a new history
+            previousGameStatesList = util.RingBuffer(historyDepth)
+        self.previousObservations = previousGameStatesList
         self.previousObservations.append(self) # add current observation
+        self.historyDepth = getattr(previousGameStatesList, 'capacity', historyDepth)
         self.directions = directions
         self.gameState = mainBoard.gameStatus
+        self.boardHash = mainBoard.boardHash # Zobrist hash of the board's blocks
+        self.occupancy = None # computed on first use, see getOccupancy
+        self.boardFeatures = None
     
     def generateSuccessorState(self, action):
-        mainBoard = copy.deepcopy(self.mainBoard)
-        previousGameStatesList = copy.deepcopy(self.previousObservations)
+        """
+        Returns the state after taking action from this state. Only the board
+        (blocks, piece, clock and keys) is copied, from this state's snapshot,
+        and the successor's history starts at this state, so a successor costs
+        the same at any point of an episode.
+        """
+        mainBoard = self.mainBoard.copy(self.snapshot)
+        previousGameStatesList = util.RingBuffer(self.historyDepth, [self])
         if mainBoard.gameStatus == 'firstStart':
             if action == 'restart':
                 mainBoard.restart()
@@ -64,8 +87,7 @@ class gameState():
                             mainBoard.piece.rotate('cCW')
                     elif mainBoard.piece.status == 'collided':			
                         if mainBoard.lineClearStatus == 'idle':
-                            for i in range(0,4):
-                                mainBoard.blockMat[mainBoard.piece.blocks[i].currentPos.row][mainBoard.piece.blocks[i].currentPos.col] = mainBoard.piece.type
+                            mainBoard.lockPiece()
                             mainBoard.clearedLines = mainBoard.getCompleteLines()
                             mainBoard.updateScores()
                         elif mainBoard.lineClearStatus == 'clearRunning':
@@ -82,6 +104,31 @@ class gameState():
     def getStateSpace(self):
         return self.space
 
+    def getBoardHash(self):
+        '''
+        Returns the Zobrist hash of the board's blocks. States with the same
+        blocks have the same hash, whatever their piece, score or history.
+        '''
+        return self.boardHash
+
+    def getOccupancy(self):
+        '''
+        Returns the board as a bool array (True where there is a block). It is
+        computed once per state, however many features read it.
+        '''
+        if self.occupancy is None:
+            self.occupancy = boardFeatures.getOccupancy(self.space)
+        return self.occupancy
+
+    def getBoardFeatures(self):
+        '''
+        Returns the board evaluation features of boardFeatures.getBoardFeatures
+        (column heights, holes, bumpiness, wells...), computed once per state.
+        '''
+        if self.boardFeatures is None:
+            self.boardFeatures = boardFeatures.getBoardFeatures(self.getOccupancy())
+        return self.boardFeatures
+
     def isStartingMenu(self):
         """
         Returns true if we're at the starting menu
@@ -106,16 +153,16 @@ class gameState():
         return self.previousObservations
 
     def getLastAction(self):
-        return self.piece.lastMoveType
+        return self.lastMoveType
 
     def getMovingPieceType(self):
-        return self.piece.type
+        return self.pieceType
 
     def getMovingPieceStatus(self):
-        return self.piece.type
+        return self.pieceType
 
     def getMovingPiecePosition(self):
-        return (self.piece.colNum, self.piece.rowNum)
+        return (self.colNum, self.rowNum)
     
     def getNextPiece(self):
         return self.nextPieces[-1]
@@ -133,6 +180,25 @@ class gameState():
         actions = ['R_rotate', 'L_rotate','down','up','downRight','downLeft','noMove']
         return actions
     
+    def getLegalPlacements(self):
+        """
+        Returns the resting placements (orientation, column, landing row) the
+        moving piece can reach, for agents that pick one placement per piece
+        instead of one action per frame.
+        """
+        if not self.isGameRunning():
+            return []
+        return self.mainBoard.copy(self.snapshot).getPlacements()
+
+    def generatePlacementSuccessor(self, placement):
+        """
+        Returns the state after the moving piece is locked at placement and
+        the next piece is spawned.
+        """
+        mainBoard = self.mainBoard.copy(self.snapshot)
+        mainBoard.commitPlacement(placement)
+        return gameState(mainBoard, util.RingBuffer(self.historyDepth, [self]), self.directions)
+
     def isTerminal(self):
         """ 
         returns if the current gameState is a terminal state
@@ -1,9 +1,9 @@
 from pynput.keyboard import Key, Controller
 
 class GenerateInput():
-    def __init__(self, action):
+    def __init__(self, action, keyboard=None):
         self.action = action
-        self.keyboard = Controller()
+        self.keyboard = keyboard if keyboard is not None else Controller() # pass one Controller to reuse it across frames
 
 
 
@@ -0,0 +1,80 @@
+"""
+Tests of the background weight checkpoints, run with
+"python -m unittest test_CheckpointManager" (or pytest)
+"""
+import json
+import os
+import tempfile
+import unittest
+from CheckpointManager import CheckpointManager
+
+class CheckpointManagerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'Weight.json')
+        self.written = [] # (weights, metadata) of every checkpoint written
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def writer(self, path, weights, metadata=None):
+        self.written.append((weights, metadata))
+        with open(path, 'w') as json_file:
+            json.dump(weights, json_file)
+
+    def newManager(self):
+        return CheckpointManager(self.path, interval=3600.0, keep=2, writer=self.writer)
+
+    def readWeights(self):
+        with open(self.path) as json_file:
+            return json.load(json_file)
+
+    def testClose(self):
+        '''
+        close writes the queued weights, and a save after close is written
+        before it returns.
+        '''
+        checkpoints = self.newManager()
+        checkpoints.save({'bias': 1.0}, {'episodes': 1})
+        checkpoints.close()
+        self.assertEqual(self.readWeights(), {'bias': 1.0})
+        checkpoints.save({'bias': 2.0}, {'episodes': 2})
+        self.assertEqual(self.readWeights(), {'bias': 2.0})
+        self.assertEqual(self.written, [({'bias': 1.0}, {'episodes': 1}), ({'bias': 2.0}, {'episodes': 2})])
+        self.assertTrue(os.path.exists(self.path + '.1'))
+        self.assertFalse(os.path.exists(self.path + '.tmp'))
+
+    def testUnchanged(self):
+        '''
+        A checkpoint is skipped only if both its weights and its metadata
+        are the ones of the last checkpoint.
+        '''
+        checkpoints = self.newManager()
+        checkpoints.close()
+        for weights, metadata in [({'bias': 1.0}, {'episodes': 1}), ({'bias': 1.0}, {'episodes': 1}),
+                                  ({'bias': 1.0}, {'episodes': 2}), ({'bias': 3.0}, {'episodes': 2}),
+                                  ({'bias': 3.0}, {'episodes': 2})]:
+            checkpoints.save(weights, metadata)
+        self.assertEqual(self.written, [({'bias': 1.0}, {'episodes': 1}), ({'bias': 1.0}, {'episodes': 2}),
+                                        ({'bias': 3.0}, {'episodes': 2})])
+        self.assertEqual(checkpoints.writeCount, 3)
+
+    def testBackground(self):
+        '''
+        With now, the thread writes the checkpoint without waiting for the
+        interval.
+        '''
+        checkpoints = self.newManager()
+        checkpoints.save({'bias': 1.0}, {'episodes': 1}, now=True)
+        for wait in range(0, 200):
+            if checkpoints.writeCount > 0:
+                break
+            checkpoints.thread.join(0.05)
+        self.assertEqual(self.written, [({'bias': 1.0}, {'episodes': 1})])
+        checkpoints.close()
+        self.assertFalse(checkpoints.thread.is_alive())
+        self.assertEqual(len(self.written), 1)
+
+if __name__ == '__main__':
+    unittest.main()
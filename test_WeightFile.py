@@ -0,0 +1,132 @@
+"""
+Tests of the binary weight files and of the weight files TetrisQAgent loads,
+run with "python -m unittest test_WeightFile" (or pytest)
+"""
+import json
+import os
+import tempfile
+import unittest
+import numpy as np
+import WeightFile
+import LearningAgent
+from LearningAgent import TetrisQAgent
+
+class WeightFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'Weight.bin')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def testRoundTrip(self):
+        '''
+        Names (non-ASCII ones included), weights and metadata read back as
+        they were written.
+        '''
+        names = ['bias', 'holes', 'höhe', 'ブロック', 'T I', '']
+        vector = [1.0, -0.25, 1e-300, -1e300, 0.1, 3.0]
+        metadata = {'episodes': 12, 'alpha': 0.7, 'note': 'épisode'}
+        WeightFile.saveWeights(self.path, names, vector, metadata)
+        weights = WeightFile.loadWeights(self.path)
+        self.assertEqual(weights.names, names)
+        self.assertEqual(weights.vector.tolist(), vector)
+        self.assertEqual(weights.metadata, metadata)
+        self.assertFalse(weights.vector.flags.writeable)
+
+    def testAlignment(self):
+        '''
+        The weights start on an 8 byte boundary and end the file, whatever
+        the size of the JSON block.
+        '''
+        for nameLength in range(0, 17):
+            names = ['x' * nameLength, 'é' * nameLength, 'y']
+            WeightFile.saveWeights(self.path, names, [1.0, 2.0, 3.0])
+            with open(self.path, 'rb') as weightFile:
+                magic, version, blockSize, featureNum = WeightFile.weightHeader.unpack(weightFile.read(WeightFile.weightHeader.size))
+            offset = WeightFile.weightHeader.size + blockSize
+            self.assertEqual(offset % 8, 0)
+            self.assertEqual(featureNum, 3)
+            self.assertEqual(os.path.getsize(self.path), offset + 8 * featureNum)
+            weights = WeightFile.loadWeights(self.path)
+            self.assertEqual(weights.names, names)
+            self.assertEqual(weights.vector.tolist(), [1.0, 2.0, 3.0])
+
+    def testEmpty(self):
+        WeightFile.saveWeights(self.path, [], [])
+        weights = WeightFile.loadWeights(self.path)
+        self.assertEqual((weights.names, len(weights.vector), weights.metadata), ([], 0, {}))
+
+    def testErrors(self):
+        with self.assertRaises(ValueError):
+            WeightFile.saveWeights(self.path, ['bias', 'holes'], [1.0])
+        with open(self.path, 'wb') as weightFile:
+            weightFile.write(b'{"bias": 1.0}' + b' ' * WeightFile.weightHeader.size)
+        with self.assertRaises(ValueError):
+            WeightFile.loadWeights(self.path)
+
+    def testJSON(self):
+        '''
+        A JSON weight file imported then exported is the same dict.
+        '''
+        jsonWeights = {'bias': 1.5, 'holes': -2.0, 'höhe': 0.125}
+        jsonPath = os.path.join(self.directory.name, 'Weight.json')
+        with open(jsonPath, 'w') as json_file:
+            json.dump(jsonWeights, json_file)
+        WeightFile.importJSON(jsonPath, self.path)
+        os.remove(jsonPath)
+        WeightFile.exportJSON(self.path, jsonPath)
+        with open(jsonPath) as json_file:
+            self.assertEqual(json.load(json_file), jsonWeights)
+
+class AgentWeightsTest(unittest.TestCase):
+    '''
+    TetrisQAgent reads WEIGHT_FILE and WEIGHT_JSON_FILE from the working
+    directory, so every test runs in its own.
+    '''
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.workingDirectory = os.getcwd()
+        os.chdir(self.directory.name)
+
+    def tearDown(self):
+        os.chdir(self.workingDirectory)
+        self.directory.cleanup()
+
+    def testNoWeights(self):
+        agent = TetrisQAgent(None)
+        self.assertEqual(dict(agent.weights), {})
+        self.assertEqual(agent.currEpisode, 0)
+
+    def testJSONImport(self):
+        '''
+        Without a weight file, the weights come from the JSON weight file.
+        '''
+        jsonWeights = {'bias': 1.5, 'holes': -2.0, 'I': 0.25}
+        with open(LearningAgent.WEIGHT_JSON_FILE, 'w') as json_file:
+            json.dump(jsonWeights, json_file)
+        agent = TetrisQAgent(None)
+        self.assertEqual(dict(agent.weights), jsonWeights)
+        self.assertEqual(agent.getWeight('holes'), -2.0)
+        self.assertEqual(agent.getWeight('unknown'), 0.0)
+        self.assertEqual(agent.weightMetadata, {})
+        self.assertEqual(agent.currEpisode, 0)
+
+    def testWeightFileFirst(self):
+        '''
+        The weight file is loaded, with its metadata, even if there is a
+        JSON weight file too.
+        '''
+        with open(LearningAgent.WEIGHT_JSON_FILE, 'w') as json_file:
+            json.dump({'bias': 1.5}, json_file)
+        WeightFile.saveWeights(LearningAgent.WEIGHT_FILE, ['bias', 'holes'], np.array([0.5, -1.0]), {'episodes': 7})
+        agent = TetrisQAgent(None)
+        self.assertEqual(dict(agent.weights), {'bias': 0.5, 'holes': -1.0})
+        self.assertEqual(agent.currEpisode, 7)
+        agent.weightVector[0] = 2.0 # a copy of the read-only map
+        self.assertEqual(agent.getWeight('bias'), 2.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+#Checks that BatchTetris plays the same games as MainBoard.stepAction, run with "python -m unittest test_batchTetris" (or pytest)
+
+import random, unittest
+import numpy as np
+import tetrisEngine
+from tetrisEngine import pieceNames, actionNames, PieceGenerator
+from batchTetris import BatchTetris
+from test_tetrisEngine import prepareLineClear
+
+statusNames = ('firstStart','running','gameOver')
+pieceStatusNames = ('uncreated','moving','collided')
+lineClearStatusNames = ('idle','clearRunning','cleared')
+actionWeights = (3,3,2,1,2,2,6,1,1,0) #Weights of actionNames in the random actions, 'restart' is only sent to lost games
+
+
+class SeededBatchTetris(BatchTetris): #Draws the pieces of every board from its own PieceGenerator, in the same order as a MainBoard
+
+	def __init__(self,seeds):
+		BatchTetris.__init__(self,len(seeds))
+		self.pieceGenerators = [PieceGenerator(seed) for seed in seeds]
+
+	def drawPieces(self,boards):
+		return np.array([pieceNames.index(self.pieceGenerators[board].nextPiece()) for board in boards],dtype=np.int64)
+
+	def setBlocks(self,board,blockMat): #Copies the blocks of a MainBoard into a board
+		self.blockMat[board] = [[0 if cell == 'empty' else pieceNames.index(cell) + 1 for cell in row] for row in blockMat]
+
+
+class BatchTetrisTest(unittest.TestCase):
+
+	def getState(self,board): #State of a MainBoard, in the terms of getBatchState
+		pieceCells = [(block.currentPos.row,block.currentPos.col) for block in board.piece.blocks] if board.piece.status != 'uncreated' else None
+		return (board.getBlockMat(),board.score,board.lines,board.level,board.gameStatus,board.piece.status,pieceCells,
+			board.lineClearStatus,board.nextPieces,board.gameClock.frameTick)
+
+	def getBatchState(self,batch,board):
+		pieceStatus = pieceStatusNames[batch.pieceStatus[board]]
+		return (batch.getBlockMat(board),int(batch.score[board]),int(batch.lines[board]),int(batch.level[board]),statusNames[batch.gameStatus[board]],
+			pieceStatus,batch.getPieceCells(board) if pieceStatus != 'uncreated' else None,
+			lineClearStatusNames[batch.lineClearStatus[board]],[pieceNames[piece] for piece in batch.nextPieces[board]],int(batch.frameTick[board]))
+
+	def prefillRows(self,board,rng): #Bottom rows with one hole each
+		for row in range(board.rowNum - rng.randrange(2,10),board.rowNum):
+			hole = rng.randrange(0,board.colNum)
+			for col in range(0,board.colNum):
+				if col != hole:
+					board.setBlock(row,col,rng.choice(pieceNames))
+
+	def testSameGames(self): #Random actions on boards of both types, prefilled rows and forced line clears, compared after every frame
+		seeds = list(range(0,12))
+		boards = [tetrisEngine.MainBoard(10,20,boardType=('list','bitboard')[seed % 2],pieceGenerator=PieceGenerator(seed)) for seed in seeds]
+		batch = SeededBatchTetris(seeds)
+		rng = random.Random(0)
+		clearedLines = 0
+		for frame in range(0,2500):
+			actions = [rng.choices(actionNames,actionWeights)[0] if board.gameStatus == 'running' else 'restart' for board in boards]
+			restarted = [board.gameStatus != 'running' for board in boards]
+			for board, action in zip(boards,actions):
+				board.stepAction(action)
+			batch.step(actions)
+			for index, board in enumerate(boards):
+				if restarted[index] and board.gameStatus == 'running':
+					self.prefillRows(board,rng)
+					batch.setBlocks(index,board.getBlockMat())
+				elif frame % 30 == 0 and board.piece.status == 'moving' and board.lineClearStatus == 'idle': #Most of these pieces clear a line
+					prepareLineClear(board)
+					batch.setBlocks(index,board.getBlockMat())
+				if board.lineClearStatus == 'clearRunning' and board.gameClock.clearAniStart == board.gameClock.frameTick - 1:
+					clearedLines = clearedLines + 1
+				self.assertEqual(self.getState(board),self.getBatchState(batch,index),'board {} frame {}'.format(index,frame))
+		self.assertGreater(clearedLines,50)
+
+
+if __name__ == '__main__':
+	unittest.main()
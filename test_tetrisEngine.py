@@ -0,0 +1,236 @@
+#Regression tests of the headless engine, run with "python -m unittest test_tetrisEngine" (or pytest)
+
+import random, unittest
+import tetrisEngine
+from tetrisEngine import actionNames, PieceGenerator
+
+
+def newBoard(boardType,seed,startingLevel):
+	board = tetrisEngine.MainBoard(10,20,boardType=boardType,pieceGenerator=PieceGenerator(seed),startingLevel=startingLevel)
+	board.stepAction('restart')
+	board.step() #Spawns the first piece
+	return board
+
+def prepareLineClear(board): #Fills the lowest row the moving piece lands in, but for the piece's cells, so its lock clears it
+	landing = board.copy()
+	while landing.piece.status == 'moving':
+		landing.step()
+	pieceCells = set((block.currentPos.row,block.currentPos.col) for block in landing.piece.blocks)
+	row = max(row for row, col in pieceCells) #The piece falls through its other rows, so they cannot be filled
+	for col in range(0,board.colNum):
+		if (row,col) not in pieceCells and board.isEmpty(row,col):
+			board.setBlock(row,col,'O')
+
+
+class AdvanceIdleTest(unittest.TestCase):
+
+	#advanceIdle(n) must end in the same snapshot as n calls to step(), wherever the n frames stop
+	def assertSameAsSteps(self,board,frameNums):
+		for frameNum in frameNums:
+			stepped = board.copy(board.snapshot())
+			for i in range(0,frameNum):
+				stepped.step()
+			advanced = board.copy(board.snapshot())
+			advanced.advanceIdle(frameNum)
+			self.assertEqual(advanced.snapshot(),stepped.snapshot(),'after {} frames'.format(frameNum))
+
+	def testLineClear(self): #Stops before the lock, at every frame of the line clear animation and after the next spawn
+		for boardType in ('list','bitboard'):
+			for startingLevel in (10,19,28):
+				for seed in range(0,3):
+					board = newBoard(boardType,seed,startingLevel)
+					prepareLineClear(board)
+					cleared = board.copy(board.snapshot())
+					while cleared.lines == 0 and cleared.gameStatus == 'running':
+						cleared.step()
+					self.assertGreater(cleared.lines,0)
+					self.assertSameAsSteps(board,range(1,cleared.gameClock.frameTick - board.gameClock.frameTick + 40))
+
+	def testAfterKeyMoves(self): #Idle stretches after moves, so the last move of the piece is not 'noMove'
+		for boardType in ('list','bitboard'):
+			for seed in range(0,4):
+				rng = random.Random(seed)
+				board = newBoard(boardType,seed,0)
+				for burst in range(0,40):
+					for i in range(0,rng.randrange(1,4)):
+						board.stepAction('restart' if board.gameStatus == 'gameOver' else rng.choice(actionNames[:7]))
+					self.assertSameAsSteps(board,[rng.randrange(1,60)])
+					board.advanceIdle(rng.randrange(1,60))
+
+
+class BoardTypeTest(unittest.TestCase):
+
+	def getState(self,board): #Everything a game shows, the same on both board types
+		return (board.getBlockMat(),board.colHeights,board.boardHash,board.score,board.lines,board.level,board.gameStatus,
+			board.lineClearStatus,board.clearedLines,board.nextPieces,board.piece.snapshot(),board.gameClock.snapshot())
+
+	def prefillRows(self,board,rng): #Bottom rows with one hole each, so that random play clears lines
+		for row in range(board.rowNum - rng.randrange(2,8),board.rowNum):
+			hole = rng.randrange(0,board.colNum)
+			for col in range(0,board.colNum):
+				if col != hole:
+					board.setBlock(row,col,rng.choice(tetrisEngine.pieceNames))
+
+	def testSameGames(self): #Random actions and idle stretches, compared after every frame
+		for seed in range(0,4):
+			rng = random.Random(seed)
+			startingLevel = rng.choice((0,18,28))
+			boards = [newBoard(boardType,seed,startingLevel) for boardType in ('list','bitboard')]
+			for board in boards:
+				self.prefillRows(board,random.Random(seed))
+			clearedLines = 0
+			for frame in range(0,6000):
+				action = rng.choice(actionNames[:7])
+				for board in boards:
+					if board.gameStatus == 'gameOver':
+						board.stepAction('restart')
+						self.prefillRows(board,random.Random(frame))
+					else:
+						if frame % 25 == 0 and board.piece.status == 'moving': #Most of these pieces clear a line
+							prepareLineClear(board)
+						if action == 'noMove':
+							board.advanceIdle(3)
+						else:
+							board.stepAction(action)
+				self.assertEqual(self.getState(boards[0]),self.getState(boards[1]),'seed {} frame {}'.format(seed,frame))
+				if boards[0].lineClearStatus == 'clearRunning' and boards[0].gameClock.clearAniStart == boards[0].gameClock.frameTick - 1:
+					clearedLines = clearedLines + 1
+			self.assertGreater(clearedLines,20)
+
+	def testSamePlacements(self): #Placement search and placement successors
+		for seed in range(0,4):
+			rng = random.Random(seed)
+			boards = [newBoard(boardType,seed,0) for boardType in ('list','bitboard')]
+			for board in boards:
+				self.prefillRows(board,random.Random(seed))
+			for piece in range(0,60):
+				placements = [board.getPlacements() for board in boards]
+				self.assertEqual(placements[0],placements[1])
+				if len(placements[0]) == 0:
+					break
+				placement = rng.choice(placements[0])
+				successors = [board.getPlacementSuccessor(placement) for board in boards]
+				self.assertEqual(self.getState(successors[0]),self.getState(successors[1]))
+				for board in boards:
+					board.commitPlacement(placement)
+				self.assertEqual(self.getState(boards[0]),self.getState(boards[1]))
+
+
+class BoardHashTest(unittest.TestCase):
+
+	#The hash kept up to date on locks, line clear animations and drops must be the one computed from the blocks, and depend on them only
+	def testIncrementalHash(self):
+		for boardType in ('list','bitboard'):
+			for seed in range(0,3):
+				rng = random.Random(seed)
+				board = newBoard(boardType,seed,18)
+				clearedLines = 0
+				for frame in range(0,4000):
+					if board.gameStatus == 'gameOver':
+						clearedLines = clearedLines + board.lines
+						board.stepAction('restart')
+					else:
+						if frame % 25 == 0 and board.piece.status == 'moving':
+							prepareLineClear(board)
+						board.stepAction(rng.choice(actionNames[:7]))
+					self.assertEqual(board.boardHash,board.getBoardHash(),'{} seed {} frame {}'.format(boardType,seed,frame))
+					if frame % 500 == 0: #A board given the same blocks in another order has the same hash
+						rebuilt = tetrisEngine.MainBoard(board.colNum,board.rowNum,boardType=boardType)
+						cells = [(row,col,pieceType) for row, blockRow in enumerate(board.getBlockMat()) for col, pieceType in enumerate(blockRow) if pieceType != 'empty']
+						rng.shuffle(cells)
+						for row, col, pieceType in cells:
+							rebuilt.setBlock(row,col,pieceType)
+						self.assertEqual(rebuilt.boardHash,board.boardHash)
+				self.assertGreater(clearedLines + board.lines,20)
+
+
+class SnapshotTest(unittest.TestCase):
+
+	def playFrames(self,board,rng,frameNum): #Random actions with forced line clears, returns the actions and the snapshot after each frame
+		actions = []
+		snapshots = []
+		for frame in range(0,frameNum):
+			if board.gameStatus == 'gameOver':
+				action = 'restart'
+			else:
+				action = rng.choice(actionNames[:7])
+				if rng.random() < 0.04 and board.piece.status == 'moving':
+					prepareLineClear(board)
+					action = 'prepareLineClear'
+			if action != 'prepareLineClear':
+				board.stepAction(action)
+			actions.append(action)
+			snapshots.append(board.snapshot())
+		return actions, snapshots
+
+	def replayFrames(self,board,actions): #Plays the actions of playFrames again, the line clears included
+		snapshots = []
+		for action in actions:
+			if action == 'prepareLineClear':
+				prepareLineClear(board)
+			else:
+				board.stepAction(action)
+			snapshots.append(board.snapshot())
+		return snapshots
+
+	def newSmallBlockBoard(self,boardType,seed,randomizer): #Pieces drawn in blocks of 5, so the games cross many blocks of the piece generator
+		board = tetrisEngine.MainBoard(10,20,boardType=boardType,pieceGenerator=PieceGenerator(seed,randomizer,blockSize=5),startingLevel=18)
+		board.stepAction('restart')
+		return board
+
+	def testRestore(self): #Restoring a snapshot and playing the same actions plays the same game, on the board itself and on a copy
+		for boardType in ('list','bitboard'):
+			for seed, randomizer in enumerate(('uniform','7bag','history')):
+				rng = random.Random(seed)
+				board = self.newSmallBlockBoard(boardType,seed,randomizer)
+				for checkpoint in range(0,6):
+					self.playFrames(board,rng,rng.randrange(1,300))
+					snapshot = board.snapshot()
+					actions, snapshots = self.playFrames(board,rng,400)
+					self.assertEqual(board.getBoardHash(),board.boardHash)
+					copy = board.copy(snapshot)
+					board.restore(snapshot)
+					self.assertEqual(board.snapshot(),snapshot)
+					self.assertEqual(self.replayFrames(board,actions),snapshots)
+					self.assertEqual(self.replayFrames(copy,actions),snapshots)
+
+	def testCopy(self): #Playing a copy never changes the original, which then plays the same game as a board that was never copied
+		for boardType in ('list','bitboard'):
+			for seed, randomizer in enumerate(('uniform','7bag','history')):
+				rng = random.Random(seed)
+				board = self.newSmallBlockBoard(boardType,seed,randomizer)
+				reference = self.newSmallBlockBoard(boardType,seed,randomizer)
+				for checkpoint in range(0,6):
+					actions, snapshots = self.playFrames(board,rng,rng.randrange(1,300))
+					self.assertEqual(self.replayFrames(reference,actions),snapshots)
+					snapshot = board.snapshot()
+					for i in range(0,3):
+						copy = board.copy()
+						self.playFrames(copy,random.Random(i),300)
+						copy.setBlock(0,0,'T')
+						placements = copy.getPlacements()
+						if len(placements) > 0:
+							copy.commitPlacement(placements[0])
+						self.assertEqual(board.snapshot(),snapshot)
+				actions, snapshots = self.playFrames(board,rng,500)
+				self.assertEqual(self.replayFrames(reference,actions),snapshots)
+
+	def testPieceGenerator(self): #A restored generator draws the same pieces, across blocks and with a copy drawing from the shared rng in between
+		for randomizer in ('uniform','7bag','history'):
+			generator = PieceGenerator(3,randomizer,blockSize=5)
+			for i in range(0,7):
+				generator.nextPiece()
+			snapshot = generator.snapshot()
+			pieces = [generator.nextPiece() for i in range(0,40)]
+			other = generator.copy()
+			other.reset(4)
+			generator.restore(snapshot)
+			self.assertEqual([generator.nextPiece() if i % 2 == 0 else other.nextPiece() for i in range(0,80)][::2],pieces)
+			generator.restore(snapshot)
+			self.assertEqual([generator.nextPiece() for i in range(0,40)],pieces)
+			fresh = PieceGenerator(3,randomizer,blockSize=5)
+			self.assertEqual([fresh.nextPiece() for i in range(0,47)][7:],pieces)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,74 @@
+#Round trip of the binary replays, run with "python -m unittest test_tetrisReplay" (or pytest)
+
+import os, random, tempfile, unittest
+from tetrisReplay import Replay, writeReplays, readReplays, randomizerNames, MAX_RUN
+
+
+def getHeightScore(board): #Lines against stack height and bumpiness, for the placements the recorded games steer to
+	bumpiness = sum(abs(board.colHeights[col] - board.colHeights[col+1]) for col in range(0,board.colNum - 1))
+	return 10*board.lines - sum(board.colHeights) - 3*bumpiness
+
+
+def recordGame(seed,startingLevel,randomizer,frameNum): #Seeded game steered to good placements with long noMove stretches, stopped at its game over
+	rng = random.Random(seed)
+	replay = Replay(seed,startingLevel,randomizer=randomizer)
+	board = replay.newBoard()
+	replay.stepAction(board,'restart')
+	target = None
+	while len(replay.actions) < frameNum and board.gameStatus == 'running':
+		piece = board.piece
+		if piece.status != 'moving':
+			target = None
+			if rng.random() < 0.3: #Longer than MAX_RUN at times, so the runs are split
+				for i in range(0,rng.randrange(1,3*MAX_RUN)):
+					replay.stepAction(board,'noMove')
+			else:
+				replay.stepAction(board,'noMove')
+			continue
+		if target is None:
+			copy = board.copy()
+			target = max(copy.getPlacements(),key=lambda placement: (getHeightScore(copy.getPlacementSuccessor(placement)),rng.random()))
+		if piece.orientation != target[0]:
+			action = 'R_rotate'
+		elif piece.originCol < target[1]:
+			action = 'right'
+		elif piece.originCol > target[1]:
+			action = 'left'
+		else:
+			action = 'down'
+		if action != 'down' and rng.random() < 0.5:
+			action = 'noMove'
+		replay.stepAction(board,action)
+	replay.setResult(board)
+	return replay
+
+
+class ReplayTest(unittest.TestCase):
+
+	def testRoundTrip(self): #Replays written to a file and read back are the same episodes, and verify on both board types
+		replays = [recordGame(seed,(0,5,9)[seed % 3],randomizerNames[seed % 3],20000) for seed in range(0,6)]
+		self.assertTrue(any(replay.lines > 0 for replay in replays))
+		with tempfile.TemporaryDirectory() as directory:
+			path = os.path.join(directory,'replays.bin')
+			writeReplays(path,replays[:3])
+			writeReplays(path,replays[3:]) #Appended to the same file
+			self.assertLess(os.path.getsize(path),sum(len(replay.actions) for replay in replays)) #Less than a byte per frame
+			readBack = readReplays(path)
+		self.assertEqual(len(readBack),len(replays))
+		for replay, readReplay in zip(replays,readBack):
+			self.assertEqual((readReplay.seed,readReplay.startingLevel,readReplay.colNum,readReplay.rowNum,readReplay.randomizer),
+				(replay.seed,replay.startingLevel,replay.colNum,replay.rowNum,replay.randomizer))
+			self.assertEqual(readReplay.actions,replay.actions)
+			self.assertEqual((readReplay.score,readReplay.lines,readReplay.level),(replay.score,replay.lines,replay.level))
+			for boardType in ('list','bitboard'):
+				self.assertTrue(readReplay.verify(boardType))
+
+	def testVerifyFails(self): #A replay whose result does not match its actions fails verify
+		replay = recordGame(1,5,'7bag',5000)
+		replay.score = replay.score + 1
+		decoded, offset = Replay.decode(replay.encode())
+		self.assertFalse(decoded.verify())
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -3,31 +3,20 @@
 #Date: 26.05.2018
 
 import pygame #version 1.9.3
-import random
 import math
 import sys
+import util
 import LearningAgent
 from gameState import gameState
-import playGame
-
-pygame.init()
-pygame.font.init()
+import tetrisEngine
+import frameProfiler
+from tetrisEngine import ROW, COL, pieceDefs, directions
 
 DISPLAY_WIDTH = 800
 DISPLAY_HEIGHT = 600
 
-gameDisplay = pygame.display.set_mode((DISPLAY_WIDTH,DISPLAY_HEIGHT))
-pygame.display.set_caption('Tetris')
-clock = pygame.time.Clock()
-
-pieceNames = ('I', 'O', 'T', 'S', 'Z', 'J', 'L')
-
-STARTING_LEVEL = 28 #Change this to start a new game at a higher level
-
-MOVE_PERIOD_INIT = 4 #Piece movement speed when up/right/left arrow keys are pressed (Speed is defined as frame count. Game is 60 fps) 
-
-CLEAR_ANI_PERIOD = 4 #Line clear animation speed
 SINE_ANI_PERIOD = 120 #Sine blinking effect speed
+SINE_COLOR_STEPS = 16 #Gray levels of the blinking texts, so each blinking string takes at most SINE_COLOR_STEPS+1 text cache entries
 
 #Font sizes
 SB_FONT_SIZE = 29 
@@ -37,15 +26,15 @@ GAMEOVER_FONT_SIZE = 66
 TITLE_FONT_SIZE = 70
 VERSION_FONT_SIZE = 20
 
-fontSB = pygame.font.SysFont('agencyfb', SB_FONT_SIZE)
-fontSmall = pygame.font.SysFont('agencyfb', FONT_SIZE_SMALL)
-fontPAUSE = pygame.font.SysFont('agencyfb', PAUSE_FONT_SIZE)
-fontGAMEOVER = pygame.font.SysFont('agencyfb', GAMEOVER_FONT_SIZE)
-fontTitle = pygame.font.SysFont('agencyfb', TITLE_FONT_SIZE)
-fontVersion = pygame.font.SysFont('agencyfb', VERSION_FONT_SIZE)
-
-ROW = (0)
-COL = (1)
+#Display, clock and fonts are only created by initDisplay(), so importing this module does not open a window
+gameDisplay = None
+clock = None
+fontSB = None
+fontSmall = None
+fontPAUSE = None
+fontGAMEOVER = None
+fontTitle = None
+fontVersion = None
 
 #Some color definitions
 BLACK = (0,0,0)
@@ -66,150 +55,73 @@ blockColors = {
 'J' : (30,30,201), #BLUE
 'L' : (240,110,2) } #ORANGE
 
-#Initial(spawn) block definitons of each piece
-pieceDefs = {
-'I' : ((1,0),(1,1),(1,2),(1,3)),
-'O' : ((0,1),(0,2),(1,1),(1,2)),
-'T' : ((0,1),(1,0),(1,1),(1,2)),
-'S' : ((0,1),(0,2),(1,0),(1,1)),
-'Z' : ((0,0),(0,1),(1,1),(1,2)),
-'J' : ((0,0),(1,0),(1,1),(1,2)),
-'L' : ((0,2),(1,0),(1,1),(1,2)) }
-
-directions = {
-'down' : (1,0),
-'right' : (0,1),
-'left' : (0,-1),
-'downRight' : (1,1),
-'downLeft' : (1,-1),
-'noMove' : (0,0) }
-
-levelSpeeds = (48,43,38,33,28,23,18,13,8,6,5,5,5,4,4,4,3,3,3,2,2,2,2,2,2,2,2,2,2)
-#The speed of the moving piece at each level. Level speeds are defined as levelSpeeds[level]
-#Each 10 cleared lines means a level up.
-#After level 29, speed is always 1. Max level is 99
-
-baseLinePoints = (0,40,100,300,1200)
-#Total score is calculated as: Score = level*baseLinePoints[clearedLineNumberAtATime] + totalDropCount
-#Drop means the action the player forces the piece down instead of free fall(By key combinations: down, down-left, down-rigth arrows)
+#Pre-rendered surfaces, so a block is one blit and a text is only rendered when it changes
+TEXT_CACHE_SIZE = 512 #Rendered texts kept, the blinking texts take one per string and gray level
+blockSprites = {} #(color, blockSize, blockLineWidth) -> block surface
+textCache = util.LRUCache(TEXT_CACHE_SIZE) #(font, string, color) -> text surface
 
-#Class for the game input keys and their status
-class GameKeyInput:
+def renderText(font,text,color): #Same surface as font.render(text, False, color), rendered once while it stays in the cache
 	
-	def __init__(self):
-		self.xNav = self.KeyName('idle',False) # 'left' 'right'
-		self.down = self.KeyName('idle',False) # 'pressed' 'released'
-		self.rotate = self.KeyName('idle',False) # 'pressed' //KEY UP
-		self.cRotate = self.KeyName('idle',False) # 'pressed' //KEY Z
-		self.enter = self.KeyName('idle',False) # 'pressed' //KEY Enter
-		self.pause = self.KeyName('idle',False) # 'pressed' //KEY P
-		self.restart = self.KeyName('idle',False) # 'pressed' //KEY R
-	
-	class KeyName:
-	
-		def __init__(self,initStatus,initTrig):
-			self.status = initStatus
-			self.trig = initTrig
-				
+	key = (font,text,tuple(color))
+	textSurface = textCache.get(key)
+	if textSurface is None:
+		textSurface = font.render(text, False, color)
+		textCache.put(key,textSurface)
+	return textSurface
 
-#Class for the game's timing events
-class GameClock:
-	
-	def __init__(self):
-		self.frameTick = 0 #The main clock tick of the game, increments at each frame (1/60 secs, 60 fps)
-		self.pausedMoment = 0
-		self.move = self.TimingType(MOVE_PERIOD_INIT) #Drop and move(right and left) timing object
-		self.fall = self.TimingType(levelSpeeds[STARTING_LEVEL]) #Free fall timing object
-		self.clearAniStart = 0
+def initDisplay():
 	
-	class TimingType:
-		
-		def __init__(self,framePeriod):
-			self.preFrame = 0
-			self.framePeriod = framePeriod
-			
-		def check(self,frameTick):
-			if frameTick - self.preFrame > self.framePeriod - 1:
-				self.preFrame = frameTick
-				return True
-			return False
+	global gameDisplay, clock, fontSB, fontSmall, fontPAUSE, fontGAMEOVER, fontTitle, fontVersion
 	
-	def pause(self):
-		self.pausedMoment = self.frameTick
+	pygame.init()
+	pygame.font.init()
 	
-	def unpause(self):
-		self.frameTick = self.pausedMoment
+	gameDisplay = pygame.display.set_mode((DISPLAY_WIDTH,DISPLAY_HEIGHT))
+	pygame.display.set_caption('Tetris')
+	clock = pygame.time.Clock()
 	
-	def restart(self):
-		self.frameTick = 0
-		self.pausedMoment = 0
-		self.move = self.TimingType(MOVE_PERIOD_INIT)
-		self.fall = self.TimingType(levelSpeeds[STARTING_LEVEL])
-		self.clearAniStart = 0
-		
-	def update(self):
-		self.frameTick = self.frameTick + 1
-		
+	fontSB = pygame.font.SysFont('agencyfb', SB_FONT_SIZE)
+	fontSmall = pygame.font.SysFont('agencyfb', FONT_SIZE_SMALL)
+	fontPAUSE = pygame.font.SysFont('agencyfb', PAUSE_FONT_SIZE)
+	fontGAMEOVER = pygame.font.SysFont('agencyfb', GAMEOVER_FONT_SIZE)
+	fontTitle = pygame.font.SysFont('agencyfb', TITLE_FONT_SIZE)
+	fontVersion = pygame.font.SysFont('agencyfb', VERSION_FONT_SIZE)
 
-# Class for all the game mechanics, visuals and events
-class MainBoard:
+# Game board with all the visuals, the mechanics are inherited from the headless engine board
+class MainBoard(tetrisEngine.MainBoard):
 
-	def __init__(self,blockSize,xPos,yPos,colNum,rowNum,boardLineWidth,blockLineWidth,scoreBoardWidth):
+	def __init__(self,blockSize,xPos,yPos,colNum,rowNum,boardLineWidth,blockLineWidth,scoreBoardWidth,gameClock=None,key=None,boardType='list',pieceGenerator=None):
+		
+		tetrisEngine.MainBoard.__init__(self,colNum,rowNum,gameClock,key,boardType,pieceGenerator)
 		
 		#Size and position initiations
 		self.blockSize = blockSize
 		self.xPos = xPos
 		self.yPos = yPos
-		self.colNum = colNum
-		self.rowNum = rowNum
 		self.boardLineWidth = boardLineWidth
 		self.blockLineWidth = blockLineWidth
 		self.scoreBoardWidth = scoreBoardWidth
 		
-		#Matrix that contains all the existing blocks in the game board, except the moving piece
-		self.blockMat = [['empty'] * colNum for i in range(rowNum)]
-		
-		self.piece = MovingPiece(colNum,rowNum,'uncreated')
-		
-		self.lineClearStatus = 'idle' # 'clearRunning' 'clearFin'
-		self.clearedLines = [-1,-1,-1,-1]
-		
-		self.gameStatus = 'firstStart' # 'running' 'gameOver'
-		self.gamePause = False
-		self.nextPieces = ['I','I']
-		
-		self.score = 0
-		self.level = STARTING_LEVEL
-		self.lines = 0
-	
-	def restart(self):
-		self.blockMat = [['empty'] * self.colNum for i in range(self.rowNum)]
-		
-		self.piece = MovingPiece(self.colNum,self.rowNum,'uncreated')
-		
-		self.lineClearStatus = 'idle'
-		self.clearedLines = [-1,-1,-1,-1]		
-		gameClock.fall.preFrame = gameClock.frameTick
-		self.generateNextTwoPieces()
-		self.gameStatus = 'running'
-		self.gamePause = False
-		
-		self.score = 0
-		self.level = STARTING_LEVEL
-		self.lines = 0
-		
-		gameClock.restart()
+		#What is on the screen, so draw only redraws what changed
+		self.drawnCells = None #Piece type or 'empty' of every drawn cell, None when the next draw must redraw the whole screen
+		self.drawnFields = None #Values shown by the scoreboard fields (next piece, score, level, lines)
 		
 	def erase_BLOCK(self,xRef,yRef,row,col):
 		pygame.draw.rect(gameDisplay, BLACK, [xRef+(col*self.blockSize),yRef+(row*self.blockSize),self.blockSize,self.blockSize],0)
 		
 	def draw_BLOCK(self,xRef,yRef,row,col,color):
-		pygame.draw.rect(gameDisplay, BLACK, [xRef+(col*self.blockSize),yRef+(row*self.blockSize),self.blockSize,self.blockLineWidth],0)
-		pygame.draw.rect(gameDisplay, BLACK, [xRef+(col*self.blockSize)+self.blockSize-self.blockLineWidth,yRef+(row*self.blockSize),self.blockLineWidth,self.blockSize],0)
-		pygame.draw.rect(gameDisplay, BLACK, [xRef+(col*self.blockSize),yRef+(row*self.blockSize),self.blockLineWidth,self.blockSize],0)
-		pygame.draw.rect(gameDisplay, BLACK, [xRef+(col*self.blockSize),yRef+(row*self.blockSize)+self.blockSize-self.blockLineWidth,self.blockSize,self.blockLineWidth],0)
-
-		pygame.draw.rect(gameDisplay, color, [xRef+(col*self.blockSize)+self.blockLineWidth,yRef+(row*self.blockSize)+self.blockLineWidth,self.blockSize-(2*self.blockLineWidth),self.blockSize-(2*self.blockLineWidth)],0)
+		gameDisplay.blit(self.getBlockSprite(color),(xRef+(col*self.blockSize),yRef+(row*self.blockSize)))
+	
+	def getBlockSprite(self,color): #Block of color with its black outline, drawn once per color and block size
+		
+		key = (tuple(color),self.blockSize,self.blockLineWidth)
+		sprite = blockSprites.get(key)
+		if sprite is None:
+			sprite = pygame.Surface((self.blockSize,self.blockSize))
+			sprite.fill(BLACK)
+			pygame.draw.rect(sprite, color, [self.blockLineWidth,self.blockLineWidth,self.blockSize-(2*self.blockLineWidth),self.blockSize-(2*self.blockLineWidth)],0)
+			blockSprites[key] = sprite
+		return sprite
 	
 	def draw_GAMEBOARD_BORDER(self):
 		pygame.draw.rect(gameDisplay, BORDER_COLOR, [self.xPos-self.boardLineWidth-self.blockLineWidth,self.yPos-self.boardLineWidth-self.blockLineWidth,(self.blockSize*self.colNum)+(2*self.boardLineWidth)+(2*self.blockLineWidth),self.boardLineWidth],0)
@@ -221,20 +133,19 @@ class MainBoard:
 	
 		if self.gameStatus == 'firstStart':	
 			
-			titleText = fontTitle.render('TETRIS', False, WHITE)
+			titleText = renderText(fontTitle,'TETRIS',WHITE)
 			gameDisplay.blit(titleText,(self.xPos++1.55*self.blockSize,self.yPos+8*self.blockSize))
 			
-			versionText = fontVersion.render('v 1.0', False, WHITE)
+			versionText = renderText(fontVersion,'v 1.0',WHITE)
 			gameDisplay.blit(versionText,(self.xPos++7.2*self.blockSize,self.yPos+11.5*self.blockSize))
 			
 		else:
 		
-			for row in range(0,self.rowNum):
+			blockMat = self.getBlockMat()
+			for row in range(0,self.rowNum): #The screen was just painted black, so only the blocks are drawn
 				for col in range(0,self.colNum):
-					if self.blockMat[row][col] == 'empty':
-						self.erase_BLOCK(self.xPos,self.yPos,row,col)
-					else:
-						self.draw_BLOCK(self.xPos,self.yPos,row,col,blockColors[self.blockMat[row][col]])
+					if blockMat[row][col] != 'empty':
+						self.draw_BLOCK(self.xPos,self.yPos,row,col,blockColors[blockMat[row][col]])
 						
 			if self.piece.status == 'moving':
 				for i in range(0,4):
@@ -242,14 +153,14 @@ class MainBoard:
 					
 			if self.gamePause == True:
 				pygame.draw.rect(gameDisplay, DARK_GRAY, [self.xPos+1*self.blockSize,self.yPos+8*self.blockSize,8*self.blockSize,4*self.blockSize],0)
-				pauseText = fontPAUSE.render('PAUSE', False, BLACK)
+				pauseText = renderText(fontPAUSE,'PAUSE',BLACK)
 				gameDisplay.blit(pauseText,(self.xPos++1.65*self.blockSize,self.yPos+8*self.blockSize))
 			
 			if self.gameStatus == 'gameOver':
 				pygame.draw.rect(gameDisplay, LIGHT_GRAY, [self.xPos+1*self.blockSize,self.yPos+8*self.blockSize,8*self.blockSize,8*self.blockSize],0)
-				gameOverText0 = fontGAMEOVER.render('GAME', False, BLACK)
+				gameOverText0 = renderText(fontGAMEOVER,'GAME',BLACK)
 				gameDisplay.blit(gameOverText0,(self.xPos++2.2*self.blockSize,self.yPos+8*self.blockSize))
-				gameOverText1 = fontGAMEOVER.render('OVER', False, BLACK)
+				gameOverText1 = renderText(fontGAMEOVER,'OVER',BLACK)
 				gameDisplay.blit(gameOverText1,(self.xPos++2.35*self.blockSize,self.yPos+12*self.blockSize))
 		
 		
@@ -265,7 +176,7 @@ class MainBoard:
 		yLastBlock = self.yPos+(self.blockSize*self.rowNum)
 	
 		if self.gameStatus == 'running':
-			nextPieceText = fontSB.render('next:', False, TEXT_COLOR)
+			nextPieceText = renderText(fontSB,'next:',TEXT_COLOR)
 			gameDisplay.blit(nextPieceText,(xPosRef+self.blockSize,self.yPos))
 			
 			blocks = [[0,0],[0,0],[0,0],[0,0]]
@@ -282,447 +193,141 @@ class MainBoard:
 					self.draw_BLOCK(xPosRef+1*self.blockSize,yPosRef+2.25*self.blockSize,blocks[i][ROW],blocks[i][COL],blockColors[self.nextPieces[1]])
 			
 			if self.gamePause == False:
-				pauseText = fontSmall.render('P -> pause', False, WHITE)
+				pauseText = renderText(fontSmall,'P -> pause',WHITE)
 				gameDisplay.blit(pauseText,(xPosRef+1*self.blockSize,yLastBlock-15*self.blockSize))
 			else:
-				unpauseText = fontSmall.render('P -> unpause', False, self.whiteSineAnimation())
+				unpauseText = renderText(fontSmall,'P -> unpause',self.whiteSineAnimation())
 				gameDisplay.blit(unpauseText,(xPosRef+1*self.blockSize,yLastBlock-15*self.blockSize))
 				
-			restartText = fontSmall.render('R -> restart', False, WHITE)
+			restartText = renderText(fontSmall,'R -> restart',WHITE)
 			gameDisplay.blit(restartText,(xPosRef+1*self.blockSize,yLastBlock-14*self.blockSize))
 					
 		else:
 		
 			yBlockRef = 0.3
-			text0 = fontSB.render('press', False, self.whiteSineAnimation())
+			text0 = renderText(fontSB,'press',self.whiteSineAnimation())
 			gameDisplay.blit(text0,(xPosRef+self.blockSize,self.yPos+yBlockRef*self.blockSize))
-			text1 = fontSB.render('enter', False, self.whiteSineAnimation())
+			text1 = renderText(fontSB,'enter',self.whiteSineAnimation())
 			gameDisplay.blit(text1,(xPosRef+self.blockSize,self.yPos+(yBlockRef+1.5)*self.blockSize))
-			text2 = fontSB.render('to', False, self.whiteSineAnimation())
+			text2 = renderText(fontSB,'to',self.whiteSineAnimation())
 			gameDisplay.blit(text2,(xPosRef+self.blockSize,self.yPos+(yBlockRef+3)*self.blockSize))
 			if self.gameStatus == 'firstStart':
-				text3 = fontSB.render('start', False, self.whiteSineAnimation())
+				text3 = renderText(fontSB,'start',self.whiteSineAnimation())
 				gameDisplay.blit(text3,(xPosRef+self.blockSize,self.yPos+(yBlockRef+4.5)*self.blockSize))
 			else:
-				text3 = fontSB.render('restart', False, self.whiteSineAnimation())
+				text3 = renderText(fontSB,'restart',self.whiteSineAnimation())
 				gameDisplay.blit(text3,(xPosRef+self.blockSize,self.yPos+(yBlockRef+4.5)*self.blockSize))		
 		
 		pygame.draw.rect(gameDisplay, BORDER_COLOR, [xPosRef,yLastBlock-12.5*self.blockSize,self.scoreBoardWidth,self.boardLineWidth],0)
 		
-		scoreText = fontSB.render('score:', False, TEXT_COLOR)
+		scoreText = renderText(fontSB,'score:',TEXT_COLOR)
 		gameDisplay.blit(scoreText,(xPosRef+self.blockSize,yLastBlock-12*self.blockSize))
-		scoreNumText = fontSB.render(str(self.score), False, NUM_COLOR)
+		scoreNumText = renderText(fontSB,str(self.score),NUM_COLOR)
 		gameDisplay.blit(scoreNumText,(xPosRef+self.blockSize,yLastBlock-10*self.blockSize))
 		
-		levelText = fontSB.render('level:', False, TEXT_COLOR)
+		levelText = renderText(fontSB,'level:',TEXT_COLOR)
 		gameDisplay.blit(levelText,(xPosRef+self.blockSize,yLastBlock-8*self.blockSize))
-		levelNumText = fontSB.render(str(self.level), False, NUM_COLOR)
+		levelNumText = renderText(fontSB,str(self.level),NUM_COLOR)
 		gameDisplay.blit(levelNumText,(xPosRef+self.blockSize,yLastBlock-6*self.blockSize))
 		
-		linesText = fontSB.render('lines:', False, TEXT_COLOR)
+		linesText = renderText(fontSB,'lines:',TEXT_COLOR)
 		gameDisplay.blit(linesText,(xPosRef+self.blockSize,yLastBlock-4*self.blockSize))
-		linesNumText = fontSB.render(str(self.lines), False, NUM_COLOR)
+		linesNumText = renderText(fontSB,str(self.lines),NUM_COLOR)
 		gameDisplay.blit(linesNumText,(xPosRef+self.blockSize,yLastBlock-2*self.blockSize))
 	
 	# All the screen drawings occurs in this function, called at each game loop iteration
+	# Returns the rects of the screen that changed, for pygame.display.update(rects). While a game is running only the cells and
+	# the scoreboard fields that changed since the previous frame are redrawn, the other screens (start, pause, game over) are animated
+	# or have overlays, so they are redrawn whole
 	def draw(self):
 		
+		if self.drawnCells is None or self.gameStatus != 'running' or self.gamePause == True:
+			return self.drawAll()
+		cells = self.getDisplayedCells()
+		if cells is None:
+			return self.drawAll()
+		
+		dirtyRects = []
+		for row in range(0,self.rowNum):
+			if cells[row] != self.drawnCells[row]:
+				for col in range(0,self.colNum):
+					if cells[row][col] != self.drawnCells[row][col]:
+						if cells[row][col] == 'empty':
+							self.erase_BLOCK(self.xPos,self.yPos,row,col)
+						else:
+							self.draw_BLOCK(self.xPos,self.yPos,row,col,blockColors[cells[row][col]])
+						dirtyRects.append(pygame.Rect(self.xPos+(col*self.blockSize),self.yPos+(row*self.blockSize),self.blockSize,self.blockSize))
+		self.drawnCells = cells
+		
+		fields = self.getScoreboardFields()
+		fieldRects = [rect for (rect, value), (drawnRect, drawnValue) in zip(fields,self.drawnFields) if value != drawnValue]
+		if len(fieldRects) > 0: #The fields are redrawn in one pass, with everything else of the scoreboard clipped out
+			gameDisplay.set_clip(fieldRects[0].unionall(fieldRects))
+			gameDisplay.fill(BLACK)
+			self.draw_SCOREBOARD_BORDER()
+			self.draw_SCOREBOARD_CONTENT()
+			gameDisplay.set_clip(None)
+			dirtyRects.extend(fieldRects)
+		self.drawnFields = fields
+		
+		return dirtyRects
+	
+	def drawAll(self): #Redraws the whole screen and returns its rect
+		
+		gameDisplay.fill(BLACK)
+		
 		self.draw_GAMEBOARD_BORDER()
 		self.draw_SCOREBOARD_BORDER()
 		
 		self.draw_GAMEBOARD_CONTENT()
 		self.draw_SCOREBOARD_CONTENT()
 		
-	def whiteSineAnimation(self):
-		
-		sine = math.floor(255 * math.fabs(math.sin(2*math.pi*(gameClock.frameTick/(SINE_ANI_PERIOD*2)))))
-		#sine = 127 + math.floor(127 * math.sin(2*math.pi*(gameClock.frameTick/SINE_ANI_PERIOD)))
-		sineEffect = [sine,sine,sine]
-		return sineEffect
-	
-	def lineClearAnimation(self):
-	
-		clearAniStage = math.floor((gameClock.frameTick - gameClock.clearAniStart)/CLEAR_ANI_PERIOD)
-		halfCol = math.floor(self.colNum/2)
-		if clearAniStage < halfCol:
-			for i in range(0,4):
-				if self.clearedLines[i] >= 0:
-					self.blockMat[self.clearedLines[i]][(halfCol)+clearAniStage] = 'empty'
-					self.blockMat[self.clearedLines[i]][(halfCol-1)-clearAniStage] = 'empty'
+		if self.gameStatus == 'running' and self.gamePause == False:
+			self.drawnCells = self.getDisplayedCells()
+			self.drawnFields = self.getScoreboardFields()
 		else:
-			self.lineClearStatus = 'cleared'
+			self.drawnCells = None
+		return [gameDisplay.get_rect()]
 	
-	def dropFreeBlocks(self): #Drops down the floating blocks after line clears occur
-		
-		for cLIndex in range(0,4):
-			if self.clearedLines[cLIndex] >= 0:
-				for rowIndex in range(self.clearedLines[cLIndex],0,-1):
-					for colIndex in range(0,self.colNum):
-						self.blockMat[rowIndex+cLIndex][colIndex] = self.blockMat[rowIndex+cLIndex-1][colIndex]
-				
-				for colIndex in range(0,self.colNum):
-					self.blockMat[0][colIndex] = 'empty'
+	def invalidate(self): #The next draw redraws the whole screen, e.g. once the window was uncovered
+		self.drawnCells = None
 	
-	def getCompleteLines(self): #Returns index list(length of 4) of cleared lines(-1 if not assigned as cleared line)
-		
-		clearedLines = [-1,-1,-1,-1]
-		cLIndex = -1
-		rowIndex = self.rowNum - 1
+	def getDisplayedCells(self): #Piece type or 'empty' of every cell as drawn, the moving piece included (None if it is out of the board)
 		
-		while rowIndex >= 0:
-			for colIndex in range(0,self.colNum):
-				if self.blockMat[rowIndex][colIndex] == 'empty':
-					rowIndex = rowIndex - 1
-					break
-				if colIndex == self.colNum - 1:
-					cLIndex = cLIndex + 1
-					clearedLines[cLIndex] = rowIndex
-					rowIndex = rowIndex - 1
-
-		if cLIndex >= 0:
-			gameClock.clearAniStart = gameClock.frameTick
-			self.lineClearStatus = 'clearRunning'
-		else:
-			self.prepareNextSpawn()
-			
-		return clearedLines
-	
-	def prepareNextSpawn(self):
-		self.generateNextPiece()
-		self.lineClearStatus = 'idle'
-		self.piece.status = 'uncreated'
-	
-	def generateNextTwoPieces(self):
-		self.nextPieces[0] = pieceNames[random.randint(0,6)]
-		self.nextPieces[1] = pieceNames[random.randint(0,6)]
-		self.piece.type = self.nextPieces[0]
-		
-	def generateNextPiece(self):
-		self.nextPieces[0] = self.nextPieces[1]
-		self.nextPieces[1] = pieceNames[random.randint(0,6)]
-		self.piece.type = self.nextPieces[0]
-		
-	def checkAndApplyGameOver(self):
-		if self.piece.gameOverCondition == True:
-			self.gameStatus = 'gameOver'
+		cells = self.getBlockMat()
+		if self.piece.status == 'moving':
 			for i in range(0,4):
-				if self.piece.blocks[i].currentPos.row >= 0 and self.piece.blocks[i].currentPos.col >= 0:
-					self.blockMat[self.piece.blocks[i].currentPos.row][self.piece.blocks[i].currentPos.col] = self.piece.type
+				row = self.piece.blocks[i].currentPos.row
+				col = self.piece.blocks[i].currentPos.col
+				if not (0 <= row < self.rowNum and 0 <= col < self.colNum):
+					return None
+				cells[row][col] = self.piece.type
+		return cells
 	
-	def updateScores(self):
+	def getScoreboardFields(self): #(rect, shown value) of the scoreboard fields of a running game, from the top down
 		
-		clearedLinesNum = 0
-		for i in range(0,4):
-			if self.clearedLines[i] > -1:
-				clearedLinesNum = clearedLinesNum + 1
-				
-		self.score = self.score + (self.level+1)*baseLinePoints[clearedLinesNum] + self.piece.dropScore
-		if self.score > 999999:
-			self.score = 999999
-		self.lines = self.lines + clearedLinesNum
-		self.level = STARTING_LEVEL + math.floor(self.lines/10)
-		if self.level > 99:
-			self.level = 99
-	
-	def updateSpeed(self):
-	
-		if self.level < 29:
-			gameClock.fall.framePeriod = levelSpeeds[self.level]
-		else:
-			gameClock.fall.framePeriod = 1
-			
-		if gameClock.fall.framePeriod < 4:
-			gameClock.fall.framePeriod = gameClock.move.framePeriod
-	
-	# All the game events and mechanics are placed in this function, called at each game loop iteration
-	def gameAction(self):
-		
-		if self.gameStatus == 'firstStart':
-			if key.enter.status == 'pressed':
-				self.restart()
-		
-		elif self.gameStatus == 'running':
-			
-			if key.restart.trig == True:
-				self.restart()
-				key.restart.trig = False
-			
-			if self.gamePause == False:
-			
-				self.piece.move(self.blockMat)
-				self.checkAndApplyGameOver()
-				
-				if key.pause.trig == True:
-					gameClock.pause()
-					self.gamePause = True
-					key.pause.trig = False
-				
-				if self.gameStatus != 'gameOver':
-					if self.piece.status == 'moving':
-						if key.rotate.trig == True:	
-							self.piece.rotate('CW')
-							key.rotate.trig = False
-							
-						if key.cRotate.trig == True:	
-							self.piece.rotate('cCW')
-							key.cRotate.trig = False
-							
-					elif self.piece.status == 'collided':			
-						if self.lineClearStatus == 'idle':
-							for i in range(0,4):
-								self.blockMat[self.piece.blocks[i].currentPos.row][self.piece.blocks[i].currentPos.col] = self.piece.type
-							self.clearedLines = self.getCompleteLines()
-							self.updateScores()
-							self.updateSpeed()
-						elif self.lineClearStatus == 'clearRunning':
-							self.lineClearAnimation()
-						else: # 'clearFin'
-							self.dropFreeBlocks()					
-							self.prepareNextSpawn()
-			
-			else: # self.gamePause = False
-				if key.pause.trig == True:
-					gameClock.unpause()
-					self.gamePause = False
-					key.pause.trig = False
-		
-		else: # 'gameOver'
-			if key.enter.status == 'pressed':
-				self.restart()
-				
-# Class for all the definitions of current moving piece
-class MovingPiece:
-
-	def __init__(self,colNum,rowNum,status):
-
-		self.colNum = colNum
-		self.rowNum = rowNum
-
-		self.blockMat = [['empty'] * colNum for i in range(rowNum)]
-		
-		self.blocks = []
-		for i in range(0,4):
-			self.blocks.append(MovingBlock())
-		
-		self.currentDef = [[0] * 2 for i in range(4)]
-		self.status = status # 'uncreated' 'moving' 'collided'
-		self.type = 'I' # 'O', 'T', 'S', 'Z', 'J', 'L'
-		
-		self.gameOverCondition = False
-		
-		self.dropScore = 0
-		self.lastMoveType = 'noMove'
-	
-	def applyNextMove(self):
-		for i in range(0,4):
-			self.blocks[i].currentPos.col = self.blocks[i].nextPos.col
-			self.blocks[i].currentPos.row = self.blocks[i].nextPos.row
-	
-	def applyFastMove(self):
-		
-		if gameClock.move.check(gameClock.frameTick) == True:
-			if self.lastMoveType == 'downRight' or self.lastMoveType == 'downLeft' or self.lastMoveType == 'down':
-				self.dropScore = self.dropScore + 1
-			self.applyNextMove()
-			
-	def slowMoveAction(self):
-	
-		if gameClock.fall.check(gameClock.frameTick) == True:
-			if self.movCollisionCheck('down') == True:
-				self.createNextMove('noMove')
-				self.status = 'collided'
-			else:
-				self.createNextMove('down')
-				self.applyNextMove()		
-			
-	def createNextMove(self,moveType):
-		
-		self.lastMoveType = moveType
-		
-		for i in range(0,4):
-			self.blocks[i].nextPos.row = self.blocks[i].currentPos.row + directions[moveType][ROW]
-			self.blocks[i].nextPos.col = self.blocks[i].currentPos.col + directions[moveType][COL]
-			
-	def movCollisionCheck_BLOCK(self,dirType,blockIndex):
-		if dirType == 'down':
-			if (self.blocks[blockIndex].currentPos.row+1 > self.rowNum-1) or self.blockMat[self.blocks[blockIndex].currentPos.row+directions[dirType][ROW]][self.blocks[blockIndex].currentPos.col+directions[dirType][COL]] != 'empty':
-				return True
-		else:
-			if ( ((directions[dirType][COL])*(self.blocks[blockIndex].currentPos.col+directions[dirType][COL])) > ( ((self.colNum-1)+(directions[dirType][COL])*(self.colNum-1)) / 2 ) or 
-				   self.blockMat[self.blocks[blockIndex].currentPos.row+directions[dirType][ROW]][self.blocks[blockIndex].currentPos.col+directions[dirType][COL]] != 'empty' ):
-				return True
-		return False	
-			
-	def movCollisionCheck(self,dirType): #Collision check for next move
-		for i in range(0,4):
-			if self.movCollisionCheck_BLOCK(dirType,i) == True:
-				return True
-		return False
-		
-	def rotCollisionCheck_BLOCK(self,blockCoor):
-		if ( blockCoor[ROW]>self.rowNum-1 or blockCoor[ROW]<0 or blockCoor[COL]>self.colNum-1 or blockCoor[COL]<0 or self.blockMat[blockCoor[ROW]][blockCoor[COL]] != 'empty'):
-			return True
-		return False
-		
-	def rotCollisionCheck(self,blockCoorList): #Collision check for rotation
-		for i in range(0,4):
-			if self.rotCollisionCheck_BLOCK(blockCoorList[i]) == True:
-				return True
-		return False
-		
-	def spawnCollisionCheck(self,origin): #Collision check for spawn
-
-		for i in range(0,4):
-			spawnRow = origin[ROW] + pieceDefs[self.type][i][ROW]			
-			spawnCol = origin[COL] + pieceDefs[self.type][i][COL]
-			if spawnRow >= 0 and spawnCol >= 0:
-				if self.blockMat[spawnRow][spawnCol] != 'empty':
-					return True
-		return False
-	
-	def findOrigin(self):
-		
-		origin = [0,0]
-		origin[ROW] = self.blocks[0].currentPos.row - self.currentDef[0][ROW]
-		origin[COL] = self.blocks[0].currentPos.col - self.currentDef[0][COL]
-		return origin
-	
-	def rotate(self,rotationType):
-		
-		if self.type != 'O':
-			tempBlocks = [[0] * 2 for i in range(4)]		
-			origin = self.findOrigin()
-			
-			if self.type == 'I':
-				pieceMatSize = 4
-			else:
-				pieceMatSize = 3
-				
-			for i in range(0,4):				
-				if rotationType == 'CW':
-					tempBlocks[i][ROW] = origin[ROW] + self.currentDef[i][COL]
-					tempBlocks[i][COL] = origin[COL] + (pieceMatSize - 1) - self.currentDef[i][ROW]
-				else:
-					tempBlocks[i][COL] = origin[COL] + self.currentDef[i][ROW]
-					tempBlocks[i][ROW] = origin[ROW] + (pieceMatSize - 1) - self.currentDef[i][COL]
-									
-			if self.rotCollisionCheck(tempBlocks) == False:
-				for i in range(0,4):
-					self.blocks[i].currentPos.row = tempBlocks[i][ROW]
-					self.blocks[i].currentPos.col = tempBlocks[i][COL]
-					self.currentDef[i][ROW] = self.blocks[i].currentPos.row - origin[ROW]
-					self.currentDef[i][COL] = self.blocks[i].currentPos.col - origin[COL]
-
-	def spawn(self):
-
-		self.dropScore = 0
-		
-		origin = [0,3]
+		xPosRef = self.xPos+(self.blockSize*self.colNum)+self.boardLineWidth+self.blockLineWidth
+		yLastBlock = self.yPos+(self.blockSize*self.rowNum)
+		width = gameDisplay.get_width()-xPosRef #Up to the screen edge, long numbers are drawn over the scoreboard border
 		
-		for i in range(0,4):		
-			self.currentDef[i] = list(pieceDefs[self.type][i])	
+		return [(pygame.Rect(xPosRef,self.yPos,width,(yLastBlock-12.5*self.blockSize)-self.yPos), self.nextPieces[1]),
+			(pygame.Rect(xPosRef,yLastBlock-12.5*self.blockSize,width,4.5*self.blockSize), self.score),
+			(pygame.Rect(xPosRef,yLastBlock-8*self.blockSize,width,4*self.blockSize), self.level),
+			(pygame.Rect(xPosRef,yLastBlock-4*self.blockSize,width,4*self.blockSize), self.lines)]
 		
-		spawnTry = 0
-		while spawnTry < 2:
-			if self.spawnCollisionCheck(origin) == False:
-				break
-			else: 
-				spawnTry = spawnTry + 1
-				origin[ROW] = origin[ROW] - 1
-				self.gameOverCondition = True
-				self.status = 'collided'
-					
-		for i in range(0,4):
-			spawnRow = origin[ROW] + pieceDefs[self.type][i][ROW]			
-			spawnCol = origin[COL] + pieceDefs[self.type][i][COL]
-			self.blocks[i].currentPos.row = spawnRow
-			self.blocks[i].currentPos.col = spawnCol
-				
-	def move(self,lastBlockMat):
-	
-		if self.status == 'uncreated':
-			self.status = 'moving'
-			self.blockMat = lastBlockMat			
-			self.spawn()
-			
-		elif self.status == 'moving':			
-			
-			if key.down.status == 'pressed':			
-				if key.xNav.status == 'right':
-					if self.movCollisionCheck('down') == True:
-						self.createNextMove('noMove')
-						self.status = 'collided'
-					elif self.movCollisionCheck('downRight') == True:
-						self.createNextMove('down')
-					else:
-						self.createNextMove('downRight')
-
-				elif key.xNav.status == 'left':					
-					if self.movCollisionCheck('down') == True:
-						self.createNextMove('noMove')
-						self.status = 'collided'
-					elif self.movCollisionCheck('downLeft') == True:
-						self.createNextMove('down')
-					else:
-						self.createNextMove('downLeft')
-						
-				else: # 'idle'
-					if self.movCollisionCheck('down') == True:
-						self.createNextMove('noMove')
-						self.status = 'collided'
-					else:
-						self.createNextMove('down')
-					
-				self.applyFastMove()
-					
-			elif key.down.status == 'idle':
-				if key.xNav.status == 'right':
-					if self.movCollisionCheck('right') == True:
-						self.createNextMove('noMove')
-					else:
-						self.createNextMove('right')
-				elif key.xNav.status == 'left':
-					if self.movCollisionCheck('left') == True:
-						self.createNextMove('noMove')
-					else:
-						self.createNextMove('left')
-				else:
-					self.createNextMove('noMove')
-					
-				self.applyFastMove()
-				
-				self.slowMoveAction()
-					
-			else: # 'released'
-				key.down.status = 'idle'
-				#gameClock.fall.preFrame = gameClock.frameTick #Commented out because each seperate down key press and release creates a delay which makes the game easier
-			
-		#else: # 'collided'			
-
-
-# Class for the blocks of the moving piece. Each piece is made of 4 blocks in Tetris game		
-class MovingBlock:
-
-	def __init__(self):
-
-		self.currentPos = self.CurrentPosClass(0,0)
-		self.nextPos = self.NextPosClass(0,0)
-	
-	class CurrentPosClass:
-	
-		def __init__(self,row,col):
-			self.row = row
-			self.col = col
-			
-	class NextPosClass:
-	
-		def __init__(self,row,col):
-			self.row = row
-			self.col = col	
+	def whiteSineAnimation(self):
 		
+		sine = math.floor(255 * math.fabs(math.sin(2*math.pi*(self.gameClock.frameTick/(SINE_ANI_PERIOD*2)))))
+		sine = round(sine*SINE_COLOR_STEPS/255)*255//SINE_COLOR_STEPS #Rounded to a gray level
+		#sine = 127 + math.floor(127 * math.sin(2*math.pi*(self.gameClock.frameTick/SINE_ANI_PERIOD)))
+		sineEffect = [sine,sine,sine]
+		return sineEffect
 
-# Main game loop		
-def gameLoop():		
+# Main game loop, profiler is a frameProfiler.FrameProfiler timing the phases of every frame (None to skip the timings)
+# The agent's action is applied to the keys in the frame it is chosen, as MainBoard.stepAction does: pressed before the game actions
+# and released after them. With usePynput it is typed as OS key presses instead (playGame), which come back as key events a frame
+# or more later, e.g. to demo the agent driving a real window
+def gameLoop(profiler=None,usePynput=False):		
 	
 	blockSize = 20 
 	boardColNum = 10 
@@ -734,26 +339,48 @@ def gameLoop():
 	boardPosY = DISPLAY_HEIGHT*0.15
 
 	mainBoard = MainBoard(blockSize,boardPosX,boardPosY,boardColNum,boardRowNum,boardLineWidth,blockLineWidth,scoreBoardWidth)	
+	key = mainBoard.key
+	gameClock = mainBoard.gameClock
+	
+	if usePynput:
+		import playGame #pynput needs a display server, so it is only imported when it is used
+		keyboard = playGame.Controller() #One controller for the whole game
 	
 	xChange = 0
 	agent = LearningAgent.TetrisQAgent(None)
 	gameExit = False
 	state = None
+	episodeEnded = False
 	while not gameExit: #Stay in this loop unless the game is quit
+		if profiler is not None:
+			profiler.startFrame()
 		if mainBoard.gameStatus == 'gameOver':
-			# calls the final function for the agent to signal the end of the episode
-			agent.final(state)
+			# calls the final function for the agent to signal the end of the episode, once per game over
+			if not episodeEnded:
+				agent.final(state)
+				episodeEnded = True
+		else:
+			episodeEnded = False
 		if state is None:
-			state = gameState(mainBoard, [], directions)
+			state = gameState(mainBoard, None, directions)
 		else:
 			state = gameState(mainBoard, state.getPreviousObservations(), directions)
+		if profiler is not None:
+			profiler.mark('observe')
 		action = agent.chooseAction(state)
+		if profiler is not None:
+			profiler.mark('chooseAction')
 		#print(action)
-		input = playGame.GenerateInput(action)
-		input.pressButton() # simulate button press
+		if usePynput:
+			input = playGame.GenerateInput(action, keyboard)
+			input.pressButton() # simulate button press
+			if profiler is not None:
+				profiler.mark('pressButton')
 		for event in pygame.event.get():	
 			if event.type == pygame.QUIT: #Looks for quitting event in every iteration (Meaning closing the game window)
 				gameExit = True
+			if event.type == pygame.VIDEOEXPOSE: #The window was uncovered, only a whole redraw restores it
+				mainBoard.invalidate()
 			if event.type == pygame.KEYDOWN: #Keyboard keys press events
 				if event.key == pygame.K_LEFT:
 					xChange += -1
@@ -779,7 +406,6 @@ def gameLoop():
 						key.restart.status = 'pressed'
 				if event.key == pygame.K_RETURN:
 					key.enter.status = 'pressed'
-			input.releaseButton() # simulate released button
 			if event.type == pygame.KEYUP: #Keyboard keys release events
 				if event.key == pygame.K_LEFT:
 					xChange += 1
@@ -804,19 +430,39 @@ def gameLoop():
 				key.xNav.status = 'left'	
 			else:
 				key.xNav.status = 'idle'
-		
-		gameDisplay.fill(BLACK) #Whole screen is painted black in every iteration before any other drawings occur 
-			
+		if profiler is not None:
+			profiler.mark('events')
+		if usePynput:
+			input.releaseButton() # simulate released button, once the frame's events are read
+			if profiler is not None:
+				profiler.mark('releaseButton')
+		
+		if not usePynput:
+			key.pressAction(action) #The agent's keys are down during this frame's game actions
+			if profiler is not None:
+				profiler.mark('pressButton')
 		mainBoard.gameAction() #Apply all the game actions here	
-		mainBoard.draw() #Draw the new board after game the new game actions
+		if profiler is not None:
+			profiler.mark('gameAction')
+		if not usePynput:
+			key.releaseAction(action)
+			if profiler is not None:
+				profiler.mark('releaseButton')
+		dirtyRects = mainBoard.draw() #Draw what changed on the board after the new game actions
 		gameClock.update() #Increment the frame tick
+		if profiler is not None:
+			profiler.mark('draw')
 		
-		pygame.display.update() #Pygame display update		
+		pygame.display.update(dirtyRects) #Pygame display update of the changed rects only		
+		if profiler is not None:
+			profiler.mark('displayUpdate')
 		clock.tick(60) #Pygame clock tick function(60 fps)
+		if profiler is not None:
+			profiler.mark('tick')
 
 # Main program
-key = GameKeyInput()		
-gameClock = GameClock()	
-gameLoop()	
-pygame.quit()
-sys.exit()
\ No newline at end of file
+if __name__ == '__main__':
+	initDisplay()
+	gameLoop(frameProfiler.FrameProfiler() if '--profile' in sys.argv else None,'--pynput' in sys.argv)	
+	pygame.quit()
+	sys.exit()
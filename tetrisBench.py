@@ -0,0 +1,213 @@
+#Seeded micro-benchmarks of the engine, the agent and the rendering, written as JSON (to bench_output.txt by default)
+#Every workload is run repeat times and its best run is kept, the median is written as well to show the noise
+#Run "python tetrisBench.py" to benchmark and "python tetrisBench.py --compare baseline.txt" to also check the results
+#against an earlier output, the exit status is 1 if a benchmark got slower by more than the threshold
+
+import argparse, json, os, platform, random, statistics, sys, time
+import tetrisEngine
+from tetrisEngine import actionNames, directions, PieceGenerator
+from gameState import gameState
+
+BENCH_SEED = 1234
+BENCH_OUTPUT = 'bench_output.txt'
+AGENT_ACTIONS = actionNames[:7] #The actions of gameState.getLegalActions()
+
+
+def newBoard(boardType='list',seed=BENCH_SEED): #Running board with the pieces of seed
+	board = tetrisEngine.MainBoard(10,20,boardType=boardType,pieceGenerator=PieceGenerator(seed),startingLevel=0)
+	board.stepAction('restart')
+	return board
+
+def randomActions(frameNum,seed=BENCH_SEED): #Same action sequence at every run
+	rng = random.Random(seed)
+	return [rng.choice(AGENT_ACTIONS) for i in range(frameNum)]
+
+def playFrame(board,action): #Frame of a random agent, a lost game is restarted
+	board.stepAction('restart' if board.gameStatus == 'gameOver' else action)
+
+def timeRuns(workload,repeat): #Seconds of every run of workload()
+	times = []
+	for i in range(repeat):
+		startTime = time.perf_counter()
+		workload()
+		times.append(time.perf_counter() - startTime)
+	return times
+
+def result(times,count,unit): #Rate (count per second) of the best and median runs
+	return {'value': count/min(times), 'median': count/statistics.median(times), 'unit': unit, 'higherIsBetter': True}
+
+def latency(times,count,unit='us'): #Microseconds per operation of the best and median runs
+	return {'value': min(times)/count*1e6, 'median': statistics.median(times)/count*1e6, 'unit': unit, 'higherIsBetter': False}
+
+
+def benchEngineSteps(results,repeat,scale): #Headless frames through MainBoard.gameAction
+	actions = randomActions(int(20000*scale))
+	for boardType in ('list','bitboard'):
+		def workload():
+			board = newBoard(boardType)
+			for action in actions:
+				playFrame(board,action)
+		results['engineSteps.' + boardType] = result(timeRuns(workload,repeat),len(actions),'frames/s')
+
+def getTetrisBoard(boardType): #Board with its 4 bottom rows full but the first column, and a collided vertical I piece that clears them
+	board = newBoard(boardType)
+	for row in range(board.rowNum - 4,board.rowNum):
+		for col in range(1,board.colNum):
+			board.setBlock(row,col,'O')
+	board.respawnPiece('I')
+	for placement in board.getPlacements():
+		if board.getPlacementSuccessor(placement).lines == 4:
+			board.piece.orientation, board.piece.originCol, board.piece.originRow = placement
+			board.piece.placeBlocks()
+			board.piece.status = 'collided'
+			return board
+
+def benchLockClear(results,repeat,scale): #lockPiece, getCompleteLines and dropFreeBlocks of a 4 line clear, the board restore between clears is not timed
+	lockNum = int(5000*scale)
+	for boardType in ('list','bitboard'):
+		board = getTetrisBoard(boardType)
+		snapshot = board.snapshot()
+		times = []
+		for run in range(repeat):
+			clearTime = 0.0
+			for i in range(lockNum):
+				board.restore(snapshot)
+				startTime = time.perf_counter()
+				board.lockPiece()
+				board.clearedLines = board.getCompleteLines()
+				board.dropFreeBlocks()
+				clearTime += time.perf_counter() - startTime
+			times.append(clearTime)
+		results['lockClear.' + boardType] = result(times,lockNum,'clears/s')
+
+def benchSuccessors(results,repeat,scale): #generateSuccessorState cost at growing episode lengths, it should not grow
+	board = newBoard()
+	actions = randomActions(int(5000*scale))
+	state = None
+	for frame, action in enumerate(actions,1):
+		state = gameState(board,None if state is None else state.getPreviousObservations(),directions)
+		if frame in (10,100,1000,5000) or frame == len(actions):
+			def workload():
+				for successorAction in AGENT_ACTIONS:
+					for i in range(20):
+						state.generateSuccessorState(successorAction)
+			results['successor.frame{}'.format(frame)] = latency(timeRuns(workload,repeat),20*len(AGENT_ACTIONS))
+		playFrame(board,action)
+
+def benchAgent(results,repeat,scale): #TetrisQAgent.getFeatures and computeActionFromQValues latency over the states of a game
+	import LearningAgent
+	agent = LearningAgent.TetrisQAgent(None,seed=BENCH_SEED)
+	agent.setWeights({}) #Weight files of the working directory must not change the results
+	board = newBoard()
+	states = []
+	state = None
+	for action in randomActions(int(2000*scale)):
+		state = gameState(board,None if state is None else state.getPreviousObservations(),directions)
+		if state.isGameRunning():
+			states.append(state)
+		playFrame(board,action)
+	def featureWorkload():
+		for state in states:
+			for action in AGENT_ACTIONS:
+				agent.getFeatures(state,action)
+	def actionWorkload():
+		for state in states:
+			agent.computeActionFromQValues(state)
+	results['agent.getFeatures'] = latency(timeRuns(featureWorkload,repeat),len(states)*len(AGENT_ACTIONS))
+	results['agent.computeAction'] = latency(timeRuns(actionWorkload,repeat),len(states))
+
+def benchRender(results,repeat,scale): #MainBoard.draw (dirty rects) and whole frame time of tetris.py on SDL's dummy video driver
+	os.environ.setdefault('SDL_VIDEODRIVER','dummy')
+	import pygame
+	import tetris
+	tetris.initDisplay()
+	board = tetris.MainBoard(20,tetris.DISPLAY_WIDTH*0.3,tetris.DISPLAY_HEIGHT*0.15,10,20,10,1,100,pieceGenerator=PieceGenerator(BENCH_SEED)) #The board of tetris.gameLoop
+	board.stepAction('restart')
+	boardSnapshot = board.snapshot()
+	actions = randomActions(int(1000*scale))
+	drawTimes = []
+	def workload():
+		board.restore(boardSnapshot)
+		board.invalidate() #Every run starts with a whole redraw
+		for action in actions:
+			playFrame(board,action)
+			startTime = time.perf_counter()
+			dirtyRects = board.draw()
+			drawTimes.append(time.perf_counter() - startTime)
+			pygame.display.update(dirtyRects)
+	results['render.frame'] = latency(timeRuns(workload,repeat),len(actions))
+	frameDrawTimes = [sum(drawTimes[i:i+len(actions)]) for i in range(0,len(drawTimes),len(actions))]
+	results['render.draw'] = latency(frameDrawTimes,len(actions))
+	pygame.quit()
+
+benchmarks = {
+	'engineSteps': benchEngineSteps,
+	'lockClear': benchLockClear,
+	'successor': benchSuccessors,
+	'agent': benchAgent,
+	'render': benchRender,
+}
+
+
+def runBenchmarks(names,repeat=5,scale=1.0):
+	results = {}
+	skipped = {}
+	for name in names:
+		try:
+			benchmarks[name](results,repeat,scale)
+		except ImportError as error: #e.g. rendering without pygame or pynput
+			skipped[name] = str(error)
+	return {
+		'seed': BENCH_SEED,
+		'repeat': repeat,
+		'scale': scale,
+		'python': platform.python_version(),
+		'platform': platform.platform(),
+		'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+		'results': results,
+		'skipped': skipped,
+	}
+
+def compareResults(baseline,current,threshold): #Returns the names of the benchmarks more than threshold (a fraction) worse than baseline
+	regressions = []
+	for name, entry in sorted(current['results'].items()):
+		if name not in baseline['results']:
+			continue
+		before = baseline['results'][name]['value']
+		after = entry['value']
+		change = (after - before)/before if entry['higherIsBetter'] else (before - after)/before #Positive is faster
+		if change < -threshold:
+			regressions.append(name)
+		print('{:24} {:>12.2f} -> {:>12.2f} {:9} {:+7.1%}{}'.format(name,before,after,entry['unit'],change,'  REGRESSION' if change < -threshold else ''))
+	return regressions
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Tetris engine, agent and rendering benchmarks')
+	parser.add_argument('benchmarks',nargs='*',help='benchmarks to run among {}, all by default'.format(', '.join(benchmarks)))
+	parser.add_argument('--output',default=BENCH_OUTPUT,help='JSON results file')
+	parser.add_argument('--repeat',type=int,default=5,help='runs of every workload, the best one is kept')
+	parser.add_argument('--scale',type=float,default=1.0,help='workload size factor, e.g. 0.1 for a quick run')
+	parser.add_argument('--compare',metavar='BASELINE',help='results file to compare with')
+	parser.add_argument('--threshold',type=float,default=0.1,help='slowdown counted as a regression, 0.1 is 10%%')
+	args = parser.parse_args()
+	for name in args.benchmarks:
+		if name not in benchmarks:
+			parser.error('unknown benchmark {}'.format(name))
+
+	baseline = None
+	if args.compare is not None: #Read before the output is written, it may be the same file
+		with open(args.compare) as baselineFile:
+			baseline = json.load(baselineFile)
+	output = runBenchmarks(args.benchmarks or list(benchmarks),args.repeat,args.scale)
+	with open(args.output,'w') as outputFile:
+		json.dump(output,outputFile,indent=1)
+	for name, error in output['skipped'].items():
+		print('{}: skipped ({})'.format(name,error))
+	if baseline is None:
+		for name, entry in sorted(output['results'].items()):
+			print('{:24} {:>12.2f} {}'.format(name,entry['value'],entry['unit']))
+	else:
+		regressions = compareResults(baseline,output,args.threshold)
+		print('{} regressions'.format(len(regressions)))
+		sys.exit(1 if regressions else 0)
@@ -0,0 +1,1028 @@
+#Tetris game engine: all the game mechanics without any display, fonts or frame cap
+#Boards built from this module can be stepped headless as fast as the CPU allows,
+#the pygame front end in tetris.py only adds the drawings on top of it.
+
+import random
+import math
+import copy
+import collections
+
+pieceNames = ('I', 'O', 'T', 'S', 'Z', 'J', 'L')
+
+STARTING_LEVEL = 28 #Change this to start a new game at a higher level
+
+MOVE_PERIOD_INIT = 4 #Piece movement speed when up/right/left arrow keys are pressed (Speed is defined as frame count. Game is 60 fps) 
+
+CLEAR_ANI_PERIOD = 4 #Line clear animation speed
+
+ROW = (0)
+COL = (1)
+
+#Initial(spawn) block definitons of each piece
+pieceDefs = {
+'I' : ((1,0),(1,1),(1,2),(1,3)),
+'O' : ((0,1),(0,2),(1,1),(1,2)),
+'T' : ((0,1),(1,0),(1,1),(1,2)),
+'S' : ((0,1),(0,2),(1,0),(1,1)),
+'Z' : ((0,0),(0,1),(1,1),(1,2)),
+'J' : ((0,0),(1,0),(1,1),(1,2)),
+'L' : ((0,2),(1,0),(1,1),(1,2)) }
+
+#All 4 orientations of each piece, obtained by rotating the spawn definitions clockwise the same way MovingPiece.rotate does
+#Orientation 0 is the spawn orientation, a clockwise rotation adds 1 and a counterclockwise one subtracts 1 (mod 4)
+def rotateDefCW(pieceDef,pieceMatSize):
+	return tuple((block[COL],(pieceMatSize - 1) - block[ROW]) for block in pieceDef)
+
+pieceOrientations = {}
+for pieceName in pieceNames:
+	orientations = [pieceDefs[pieceName]]
+	for i in range(0,3):
+		if pieceName == 'O':
+			orientations.append(pieceDefs[pieceName])
+		else:
+			orientations.append(rotateDefCW(orientations[-1],4 if pieceName == 'I' else 3))
+	pieceOrientations[pieceName] = tuple(orientations)
+
+#Bitboard masks of each orientation: tuple of (rowOffset, colBits) pairs, bit n of colBits is set when column offset n is filled
+pieceRowMasks = {}
+for pieceName in pieceNames:
+	orientationMasks = []
+	for orientation in pieceOrientations[pieceName]:
+		rowMasks = {}
+		for block in orientation:
+			rowMasks[block[ROW]] = rowMasks.get(block[ROW],0) | (1 << block[COL])
+		orientationMasks.append(tuple(sorted(rowMasks.items())))
+	pieceRowMasks[pieceName] = tuple(orientationMasks)
+
+#Bitboard rows keep the piece type of each cell as a code packed on TYPE_BITS bits (column n at bit n*TYPE_BITS), 0 is an empty cell
+TYPE_BITS = 3
+TYPE_MASK = (1 << TYPE_BITS) - 1
+pieceCodes = dict((pieceName, code + 1) for code, pieceName in enumerate(pieceNames))
+cellNames = ('empty',) + pieceNames
+
+directions = {
+'down' : (1,0),
+'right' : (0,1),
+'left' : (0,-1),
+'downRight' : (1,1),
+'downLeft' : (1,-1),
+'noMove' : (0,0) }
+
+levelSpeeds = (48,43,38,33,28,23,18,13,8,6,5,5,5,4,4,4,3,3,3,2,2,2,2,2,2,2,2,2,2)
+#The speed of the moving piece at each level. Level speeds are defined as levelSpeeds[level]
+#Each 10 cleared lines means a level up.
+#After level 29, speed is always 1. Max level is 99
+
+baseLinePoints = (0,40,100,300,1200)
+#Total score is calculated as: Score = level*baseLinePoints[clearedLineNumberAtATime] + totalDropCount
+#Drop means the action the player forces the piece down instead of free fall(By key combinations: down, down-left, down-rigth arrows)
+
+actionNames = ('R_rotate','L_rotate','down','up','downRight','downLeft','noMove','left','right','restart')
+#Actions are the names of gameState.getLegalActions, plus the ones playGame.GenerateInput also knows
+#The index of an action is its code in batchTetris and in replay files, so new actions go at the end
+
+#Zobrist style board hash keyed per row: the hash of a board is the sum (mod 2**64) of the keys of its occupied cells, and the key of
+#cell (row, col) is colKeys[col] * rowMultipliers[row]. The hash is then the sum over the rows of (sum of the column keys of the row)
+#times the row's multiplier, so a row that moves down in a line clear is re-keyed with one product instead of a scan of its cells
+ZOBRIST_SEED = 1 #Seed of the column keys and row multipliers
+HASH_MASK = (1 << 64) - 1
+zobristKeyTables = {}
+
+def getZobristKeys(colNum,rowNum): #(column keys, row multipliers, cell keys[row][col]). All the boards of a size share them, so their hashes can be compared
+	if (colNum,rowNum) not in zobristKeyTables:
+		rng = random.Random(ZOBRIST_SEED)
+		colKeys = [rng.getrandbits(64) for col in range(0,colNum)]
+		rowMultipliers = [rng.getrandbits(64) | 1 for row in range(0,rowNum)]
+		cellKeys = [[(colKey * rowMultiplier) & HASH_MASK for colKey in colKeys] for rowMultiplier in rowMultipliers]
+		zobristKeyTables[(colNum,rowNum)] = (colKeys,rowMultipliers,cellKeys)
+	return zobristKeyTables[(colNum,rowNum)]
+
+#Class for the game input keys and their status
+class GameKeyInput:
+	
+	def __init__(self):
+		self.xNav = self.KeyName('idle',False) # 'left' 'right'
+		self.down = self.KeyName('idle',False) # 'pressed' 'released'
+		self.rotate = self.KeyName('idle',False) # 'pressed' //KEY UP
+		self.cRotate = self.KeyName('idle',False) # 'pressed' //KEY Z
+		self.enter = self.KeyName('idle',False) # 'pressed' //KEY Enter
+		self.pause = self.KeyName('idle',False) # 'pressed' //KEY P
+		self.restart = self.KeyName('idle',False) # 'pressed' //KEY R
+	
+	class KeyName:
+	
+		def __init__(self,initStatus,initTrig):
+			self.status = initStatus
+			self.trig = initTrig
+	
+	def snapshot(self):
+		return tuple((keyName.status,keyName.trig) for keyName in (self.xNav,self.down,self.rotate,self.cRotate,self.enter,self.pause,self.restart))
+	
+	def restore(self,snapshot):
+		for keyName, keyState in zip((self.xNav,self.down,self.rotate,self.cRotate,self.enter,self.pause,self.restart),snapshot):
+			keyName.status, keyName.trig = keyState
+	
+	#Agent actions are applied as key taps: the keys of the action are pressed before the game actions of a frame and released after them,
+	#with the same status changes as the key down and key up events of the keys playGame.GenerateInput presses for that action
+	def pressAction(self,action):
+		if action == 'down' or action == 'downRight' or action == 'downLeft':
+			self.down.status = 'pressed'
+		if action == 'right' or action == 'downRight':
+			self.xNav.status = 'right'
+		elif action == 'left' or action == 'downLeft':
+			self.xNav.status = 'left'
+		if action == 'R_rotate' and self.rotate.status == 'idle':
+			self.rotate.trig = True
+			self.rotate.status = 'pressed'
+		if action == 'L_rotate' and self.cRotate.status == 'idle':
+			self.cRotate.trig = True
+			self.cRotate.status = 'pressed'
+		if action == 'restart':
+			self.enter.status = 'pressed'
+	
+	def releaseAction(self,action):
+		if action == 'down' or action == 'downRight' or action == 'downLeft':
+			self.down.status = 'released'
+		if action == 'right' or action == 'downRight' or action == 'left' or action == 'downLeft':
+			self.xNav.status = 'idle'
+		if action == 'R_rotate':
+			self.rotate.status = 'idle'
+		if action == 'L_rotate':
+			self.cRotate.status = 'idle'
+		if action == 'restart':
+			self.enter.status = 'idle'
+				
+
+#Class for the game's timing events
+class GameClock:
+	
+	def __init__(self,startingLevel=None):
+		self.startingLevel = startingLevel if startingLevel is not None else STARTING_LEVEL
+		self.frameTick = 0 #The main clock tick of the game, increments at each frame (1/60 secs, 60 fps)
+		self.pausedMoment = 0
+		self.move = self.TimingType(MOVE_PERIOD_INIT) #Drop and move(right and left) timing object
+		self.fall = self.TimingType(levelSpeeds[self.startingLevel]) #Free fall timing object
+		self.clearAniStart = 0
+	
+	class TimingType:
+		
+		def __init__(self,framePeriod):
+			self.preFrame = 0
+			self.framePeriod = framePeriod
+			
+		def check(self,frameTick):
+			if frameTick - self.preFrame > self.framePeriod - 1:
+				self.preFrame = frameTick
+				return True
+			return False
+		
+		def nextFrame(self): #First frame at which check returns True
+			return self.preFrame + self.framePeriod
+			
+		def skipChecks(self,firstFrame,lastFrame): #Same result as calling check at every frame from firstFrame to lastFrame
+			firstCheck = max(firstFrame,self.nextFrame())
+			if firstCheck <= lastFrame:
+				self.preFrame = firstCheck + ((lastFrame - firstCheck)//self.framePeriod)*self.framePeriod
+	
+	def pause(self):
+		self.pausedMoment = self.frameTick
+	
+	def unpause(self):
+		self.frameTick = self.pausedMoment
+	
+	def restart(self):
+		self.frameTick = 0
+		self.pausedMoment = 0
+		self.move = self.TimingType(MOVE_PERIOD_INIT)
+		self.fall = self.TimingType(levelSpeeds[self.startingLevel])
+		self.clearAniStart = 0
+		
+	def update(self):
+		self.frameTick = self.frameTick + 1
+	
+	def snapshot(self):
+		return (self.frameTick,self.pausedMoment,self.move.preFrame,self.move.framePeriod,self.fall.preFrame,self.fall.framePeriod,self.clearAniStart)
+	
+	def restore(self,snapshot):
+		self.frameTick, self.pausedMoment, self.move.preFrame, self.move.framePeriod, self.fall.preFrame, self.fall.framePeriod, self.clearAniStart = snapshot
+		
+
+# Piece generator of a board. It draws from its own random.Random, so boards built with the same seed get the same pieces
+# Pieces are drawn in blocks of blockSize names, so a spawn only reads the next name of the current block
+class PieceGenerator:
+
+	def __init__(self,seed=None,randomizer='uniform',blockSize=4096):
+		self.randomizer = randomizer # 'uniform' '7bag' 'history'
+		self.blockSize = blockSize
+		self.rng = random.Random()
+		self.reset(seed)
+	
+	def reset(self,seed=None): #Restarts the piece sequence of seed
+		self.seed = seed
+		self.rng.seed(seed)
+		self.rngState = self.rng.getstate() #State of rng after the current block was drawn
+		self.history = ('Z','S','Z','S') #Last 4 pieces of the 'history' randomizer
+		self.block = ()
+		self.index = 0
+	
+	def nextPiece(self):
+		if self.index >= len(self.block):
+			self.drawBlock()
+		self.index = self.index + 1
+		return self.block[self.index - 1]
+	
+	def drawBlock(self):
+		rng = self.rng
+		rng.setstate(self.rngState)
+		if self.randomizer == '7bag': #Every 7 pieces hold each piece once, in a random order
+			block = []
+			for i in range(0,-(-self.blockSize//7)):
+				bag = list(pieceNames)
+				rng.shuffle(bag)
+				block.extend(bag)
+		elif self.randomizer == 'history': #A piece among the last 4 pieces is rerolled, up to 4 rolls
+			block = []
+			history = list(self.history)
+			for i in range(0,self.blockSize):
+				for roll in range(0,4):
+					pieceName = pieceNames[rng.randrange(7)]
+					if pieceName not in history:
+						break
+				history.pop(0)
+				history.append(pieceName)
+				block.append(pieceName)
+			self.history = tuple(history)
+		else: #Every piece has the same probability, like the original game
+			block = rng.choices(pieceNames,k=self.blockSize)
+		self.block = tuple(block)
+		self.index = 0
+		self.rngState = rng.getstate()
+	
+	def snapshot(self): #Blocks and rng states are immutable, so a snapshot only holds references
+		return (self.block, self.index, self.rngState, self.history)
+	
+	def restore(self,snapshot):
+		self.block, self.index, self.rngState, self.history = snapshot
+	
+	def copy(self): #The copy shares rng, which is always set to rngState before drawing
+		return copy.copy(self)
+		
+
+# Class for all the game mechanics and events. Drawing is added on top of it by tetris.MainBoard
+# Every board owns its clock and key input objects, so any number of boards can be stepped side by side
+class MainBoard:
+
+	def __init__(self,colNum,rowNum,gameClock=None,key=None,boardType='list',pieceGenerator=None,startingLevel=None):
+		
+		self.colNum = colNum
+		self.rowNum = rowNum
+		self.boardType = boardType # 'list' 'bitboard'
+		self.startingLevel = startingLevel if startingLevel is not None else STARTING_LEVEL
+		
+		self.gameClock = gameClock if gameClock is not None else GameClock(self.startingLevel)
+		self.key = key if key is not None else GameKeyInput()
+		self.pieceGenerator = pieceGenerator if pieceGenerator is not None else PieceGenerator()
+		
+		#Matrix that contains all the existing blocks in the game board, except the moving piece ('list' board type)
+		self.blockMat = [['empty'] * colNum for i in range(rowNum)] if boardType == 'list' else None
+		
+		#With the 'bitboard' board type the blocks are only ints: the occupancy of each row as a bitmask (bit n is column n),
+		#used for collisions, full rows and drops, and the piece types of each row packed in rowTypes, only read by getBlockMat
+		self.rowBits = [0] * rowNum if boardType == 'bitboard' else None
+		self.rowTypes = [0] * rowNum if boardType == 'bitboard' else None
+		self.fullRowBits = (1 << colNum) - 1
+		
+		#Number of blocks in each row ('list' board type) and height of each column, kept up to date as blocks are set and erased
+		self.rowFill = [0] * rowNum if boardType == 'list' else None
+		self.colHeights = [0] * colNum
+		
+		#Hash of the occupied cells and the column key sum of each row, kept up to date with them. Boards with the same blocks have the same hash
+		self.colKeys, self.rowMultipliers, self.cellKeys = getZobristKeys(colNum,rowNum)
+		self.rowKeySums = [0] * rowNum
+		self.boardHash = 0
+		
+		self.piece = MovingPiece(colNum,rowNum,'uncreated',self.gameClock,self.key,self.rowBits is not None)
+		
+		self.lineClearStatus = 'idle' # 'clearRunning' 'clearFin'
+		self.clearedLines = [-1,-1,-1,-1]
+		
+		self.gameStatus = 'firstStart' # 'running' 'gameOver'
+		self.gamePause = False
+		self.nextPieces = ['I','I']
+		
+		self.score = 0
+		self.level = self.startingLevel
+		self.lines = 0
+	
+	def restart(self):
+		if self.rowBits is not None:
+			self.rowBits = [0] * self.rowNum
+			self.rowTypes = [0] * self.rowNum
+		else:
+			self.blockMat = [['empty'] * self.colNum for i in range(self.rowNum)]
+			self.rowFill = [0] * self.rowNum
+		self.colHeights = [0] * self.colNum
+		self.rowKeySums = [0] * self.rowNum
+		self.boardHash = 0
+		
+		self.piece = MovingPiece(self.colNum,self.rowNum,'uncreated',self.gameClock,self.key,self.rowBits is not None)
+		
+		self.lineClearStatus = 'idle'
+		self.clearedLines = [-1,-1,-1,-1]		
+		self.gameClock.fall.preFrame = self.gameClock.frameTick
+		self.generateNextTwoPieces()
+		self.gameStatus = 'running'
+		self.gamePause = False
+		
+		self.score = 0
+		self.level = self.startingLevel
+		self.lines = 0
+		
+		self.gameClock.restart()
+	
+	#A snapshot holds copies of everything that changes during a game (blocks, counters, piece, clock and keys) as plain values,
+	#so saving and restoring a board costs a few list copies instead of a copy.deepcopy of the whole object graph
+	def snapshot(self):
+		return ([row[:] for row in self.blockMat] if self.blockMat is not None else None,
+			self.rowBits[:] if self.rowBits is not None else None,
+			self.rowTypes[:] if self.rowTypes is not None else None,
+			self.rowFill[:] if self.rowFill is not None else None,
+			self.colHeights[:],
+			self.rowKeySums[:],
+			self.boardHash,
+			self.lineClearStatus,
+			self.clearedLines[:],
+			self.gameStatus,
+			self.gamePause,
+			self.nextPieces[:],
+			self.score,
+			self.level,
+			self.lines,
+			self.piece.snapshot(),
+			self.gameClock.snapshot(),
+			self.key.snapshot(),
+			self.pieceGenerator.snapshot())
+	
+	def restore(self,snapshot):
+		blockMat, rowBits, rowTypes, rowFill, colHeights, rowKeySums, self.boardHash, self.lineClearStatus, clearedLines, self.gameStatus, self.gamePause, nextPieces, self.score, self.level, self.lines, pieceSnapshot, clockSnapshot, keySnapshot, generatorSnapshot = snapshot
+		self.blockMat = [row[:] for row in blockMat] if blockMat is not None else None
+		self.rowBits = rowBits[:] if rowBits is not None else None
+		self.rowTypes = rowTypes[:] if rowTypes is not None else None
+		self.rowFill = rowFill[:] if rowFill is not None else None
+		self.colHeights = colHeights[:]
+		self.rowKeySums = rowKeySums[:]
+		self.clearedLines = clearedLines[:]
+		self.nextPieces = nextPieces[:]
+		self.piece.restore(pieceSnapshot)
+		self.piece.blockMat = self.blockMat
+		self.piece.rowBits = self.rowBits
+		self.gameClock.restore(clockSnapshot)
+		self.key.restore(keySnapshot)
+		self.pieceGenerator.restore(generatorSnapshot)
+	
+	def copy(self,snapshot=None): #Independent copy of the board with its own piece, clock, keys and piece generator, in the state of snapshot if given
+		board = copy.copy(self)
+		board.gameClock = GameClock(self.gameClock.startingLevel)
+		board.key = GameKeyInput()
+		board.pieceGenerator = self.pieceGenerator.copy()
+		board.piece = MovingPiece(self.colNum,self.rowNum,'uncreated',board.gameClock,board.key,self.rowBits is not None)
+		board.restore(snapshot if snapshot is not None else self.snapshot())
+		return board
+	
+	def setBlock(self,row,col,pieceType):
+		if self.rowBits is not None:
+			colBit = 1 << col
+			typeShift = col*TYPE_BITS
+			if self.rowBits[row] & colBit == 0:
+				self.rowBits[row] = self.rowBits[row] | colBit
+				self.rowKeySums[row] = self.rowKeySums[row] + self.colKeys[col]
+				self.boardHash = (self.boardHash + self.cellKeys[row][col]) & HASH_MASK
+				if self.colHeights[col] < self.rowNum - row:
+					self.colHeights[col] = self.rowNum - row
+			self.rowTypes[row] = (self.rowTypes[row] & ~(TYPE_MASK << typeShift)) | (pieceCodes[pieceType] << typeShift)
+			return
+		if self.blockMat[row][col] == 'empty':
+			self.rowFill[row] = self.rowFill[row] + 1
+			self.rowKeySums[row] = self.rowKeySums[row] + self.colKeys[col]
+			self.boardHash = (self.boardHash + self.cellKeys[row][col]) & HASH_MASK
+			if self.colHeights[col] < self.rowNum - row:
+				self.colHeights[col] = self.rowNum - row
+		self.blockMat[row][col] = pieceType
+	
+	def eraseBlock(self,row,col):
+		if self.rowBits is not None:
+			colBit = 1 << col
+			if self.rowBits[row] & colBit:
+				self.rowBits[row] = self.rowBits[row] ^ colBit
+				self.rowTypes[row] = self.rowTypes[row] & ~(TYPE_MASK << (col*TYPE_BITS))
+				self.rowKeySums[row] = self.rowKeySums[row] - self.colKeys[col]
+				self.boardHash = (self.boardHash - self.cellKeys[row][col]) & HASH_MASK
+				if self.colHeights[col] == self.rowNum - row:
+					self.updateColHeight(col,row)
+			return
+		if self.blockMat[row][col] != 'empty':
+			self.rowFill[row] = self.rowFill[row] - 1
+			self.rowKeySums[row] = self.rowKeySums[row] - self.colKeys[col]
+			self.boardHash = (self.boardHash - self.cellKeys[row][col]) & HASH_MASK
+			self.blockMat[row][col] = 'empty'
+			if self.colHeights[col] == self.rowNum - row:
+				self.updateColHeight(col,row)
+	
+	def isEmpty(self,row,col):
+		if self.rowBits is not None:
+			return self.rowBits[row] & (1 << col) == 0
+		return self.blockMat[row][col] == 'empty'
+	
+	def updateColHeight(self,col,topRow): #Finds the height of a column, there are no blocks above topRow
+		row = topRow
+		if self.rowBits is not None:
+			colBit = 1 << col
+			while row < self.rowNum and self.rowBits[row] & colBit == 0:
+				row = row + 1
+		else:
+			while row < self.rowNum and self.blockMat[row][col] == 'empty':
+				row = row + 1
+		self.colHeights[col] = self.rowNum - row
+	
+	def updateBitColHeights(self): #Heights of all the columns from the row bitmasks, in one pass from the top row down
+		heights = [0] * self.colNum
+		seenBits = 0
+		for row in range(0,self.rowNum):
+			newBits = self.rowBits[row] & ~seenBits
+			if newBits:
+				seenBits = seenBits | newBits
+				while newBits:
+					lowBit = newBits & -newBits
+					heights[lowBit.bit_length() - 1] = self.rowNum - row
+					newBits = newBits ^ lowBit
+				if seenBits == self.fullRowBits:
+					break
+		self.colHeights[:] = heights
+	
+	def getBlockMat(self,snapshot=None): #Piece type or 'empty' of every cell as a list of rows, from snapshot if given (its own rows, not copied)
+		blockMat, rowBits, rowTypes = snapshot[0:3] if snapshot is not None else (self.blockMat,self.rowBits,self.rowTypes)
+		if rowTypes is None:
+			return blockMat if snapshot is not None else [row[:] for row in blockMat]
+		typeShifts = range(0,self.colNum*TYPE_BITS,TYPE_BITS)
+		return [[cellNames[(types >> typeShift) & TYPE_MASK] for typeShift in typeShifts] for types in rowTypes]
+	
+	def rebuildBoardState(self): #Recomputes the occupancy data from the blocks (blockMat or rowTypes), needed after they are edited directly
+		for row in range(0,self.rowNum):
+			if self.rowBits is not None:
+				rowBits = 0
+				for col in range(0,self.colNum):
+					if (self.rowTypes[row] >> (col*TYPE_BITS)) & TYPE_MASK:
+						rowBits = rowBits | (1 << col)
+				self.rowBits[row] = rowBits
+			else:
+				self.rowFill[row] = self.colNum - self.blockMat[row].count('empty')
+		for col in range(0,self.colNum):
+			self.updateColHeight(col,0)
+		self.rowKeySums = [self.getRowKeySum(row) for row in range(0,self.rowNum)]
+		self.boardHash = self.getBoardHash()
+	
+	def getRowKeySum(self,row): #Column key sum of a row computed from its blocks, rowKeySums keeps the same value incrementally
+		rowKeySum = 0
+		for col in range(0,self.colNum):
+			if not self.isEmpty(row,col):
+				rowKeySum = rowKeySum + self.colKeys[col]
+		return rowKeySum
+	
+	def getBoardHash(self): #Hash computed from the blocks, boardHash keeps the same value incrementally
+		boardHash = 0
+		for row in range(0,self.rowNum):
+			boardHash = boardHash + self.getRowKeySum(row) * self.rowMultipliers[row]
+		return boardHash & HASH_MASK
+	
+	def lockPiece(self): #Places the blocks of the collided piece into the board
+		for i in range(0,4):
+			self.setBlock(self.piece.blocks[i].currentPos.row,self.piece.blocks[i].currentPos.col,self.piece.type)
+		
+	def lineClearAnimation(self):
+	
+		clearAniStage = math.floor((self.gameClock.frameTick - self.gameClock.clearAniStart)/CLEAR_ANI_PERIOD)
+		halfCol = math.floor(self.colNum/2)
+		if clearAniStage < halfCol:
+			for i in range(0,4):
+				if self.clearedLines[i] >= 0:
+					self.eraseBlock(self.clearedLines[i],(halfCol)+clearAniStage)
+					self.eraseBlock(self.clearedLines[i],(halfCol-1)-clearAniStage)
+		else:
+			self.lineClearStatus = 'cleared'
+	
+	def dropFreeBlocks(self): #Drops down the floating blocks after line clears occur
+		
+		#The cleared rows are taken out and the rows above them move down by reference in a single pass
+		clearedRows = [row for row in self.clearedLines if row >= 0]
+		if len(clearedRows) == 0:
+			return
+		keptRows = [row for row in range(0,self.rowNum) if row not in clearedRows]
+		newRows = range(0,len(clearedRows))
+		
+		if self.rowBits is not None: #Only the ints of the rows move
+			self.rowBits[:] = [0 for i in newRows] + [self.rowBits[row] for row in keptRows]
+			self.rowTypes[:] = [0 for i in newRows] + [self.rowTypes[row] for row in keptRows]
+			self.updateBitColHeights()
+		else:
+			self.blockMat[:] = [['empty'] * self.colNum for i in newRows] + [self.blockMat[row] for row in keptRows]
+			self.rowFill[:] = [0 for i in newRows] + [self.rowFill[row] for row in keptRows]
+			for col in range(0,self.colNum): #Columns only get lower, so their new tops are below the old ones
+				self.updateColHeight(col,self.rowNum - self.colHeights[col])
+		
+		#Only the rows down to the lowest cleared one moved, each of them is re-keyed in the hash if its contents changed
+		movedRowNum = max(clearedRows) + 1
+		movedRowKeySums = [0 for i in newRows] + [self.rowKeySums[row] for row in keptRows[:movedRowNum - len(clearedRows)]]
+		boardHash = self.boardHash
+		for row in range(0,movedRowNum):
+			if movedRowKeySums[row] != self.rowKeySums[row]:
+				boardHash = boardHash + (movedRowKeySums[row] - self.rowKeySums[row]) * self.rowMultipliers[row]
+		self.boardHash = boardHash & HASH_MASK
+		self.rowKeySums[:movedRowNum] = movedRowKeySums
+	
+	def getCompleteLines(self): #Returns index list(length of 4) of cleared lines(-1 if not assigned as cleared line)
+		
+		#Only the rows of the locked piece can be completed, so only their fill counts are checked (from the bottom row up)
+		clearedLines = [-1,-1,-1,-1]
+		cLIndex = -1
+		
+		pieceRows = sorted(set(block.currentPos.row for block in self.piece.blocks), reverse=True)
+		if self.rowBits is not None:
+			for rowIndex in pieceRows:
+				if self.rowBits[rowIndex] == self.fullRowBits:
+					cLIndex = cLIndex + 1
+					clearedLines[cLIndex] = rowIndex
+		else:
+			for rowIndex in pieceRows:
+				if self.rowFill[rowIndex] == self.colNum:
+					cLIndex = cLIndex + 1
+					clearedLines[cLIndex] = rowIndex
+
+		if cLIndex >= 0:
+			self.gameClock.clearAniStart = self.gameClock.frameTick
+			self.lineClearStatus = 'clearRunning'
+		else:
+			self.prepareNextSpawn()
+			
+		return clearedLines
+	
+	def prepareNextSpawn(self):
+		self.generateNextPiece()
+		self.lineClearStatus = 'idle'
+		self.piece.status = 'uncreated'
+	
+	def generateNextTwoPieces(self):
+		self.nextPieces[0] = self.pieceGenerator.nextPiece()
+		self.nextPieces[1] = self.pieceGenerator.nextPiece()
+		self.piece.type = self.nextPieces[0]
+		
+	def generateNextPiece(self):
+		self.nextPieces[0] = self.nextPieces[1]
+		self.nextPieces[1] = self.pieceGenerator.nextPiece()
+		self.piece.type = self.nextPieces[0]
+		
+	def checkAndApplyGameOver(self):
+		if self.piece.gameOverCondition == True:
+			self.gameStatus = 'gameOver'
+			for i in range(0,4):
+				if self.piece.blocks[i].currentPos.row >= 0 and self.piece.blocks[i].currentPos.col >= 0:
+					self.setBlock(self.piece.blocks[i].currentPos.row,self.piece.blocks[i].currentPos.col,self.piece.type)
+	
+	def updateScores(self):
+		
+		clearedLinesNum = 0
+		for i in range(0,4):
+			if self.clearedLines[i] > -1:
+				clearedLinesNum = clearedLinesNum + 1
+				
+		self.score = self.score + (self.level+1)*baseLinePoints[clearedLinesNum] + self.piece.dropScore
+		if self.score > 999999:
+			self.score = 999999
+		self.lines = self.lines + clearedLinesNum
+		self.level = self.startingLevel + math.floor(self.lines/10)
+		if self.level > 99:
+			self.level = 99
+	
+	def updateSpeed(self):
+	
+		if self.level < 29:
+			self.gameClock.fall.framePeriod = levelSpeeds[self.level]
+		else:
+			self.gameClock.fall.framePeriod = 1
+			
+		if self.gameClock.fall.framePeriod < 4:
+			self.gameClock.fall.framePeriod = self.gameClock.move.framePeriod
+	
+	def spawnPiece(self): #Spawns the next piece if it is not created yet, as the first frame of a new piece does
+		if self.gameStatus == 'running' and self.piece.status == 'uncreated':
+			self.piece.move(self.blockMat,self.rowBits)
+			self.checkAndApplyGameOver()
+	
+	# Placement level actions: instead of one key action per frame, the agent picks where the piece ends up
+	def getPlacements(self): #Resting placements (orientation, originCol, landingRow) reachable by the moving piece
+		self.spawnPiece()
+		if self.gameStatus != 'running' or self.piece.status != 'moving':
+			return []
+		return self.piece.findPlacements()
+	
+	def commitPlacement(self,placement): #Locks the moving piece at a placement from getPlacements, clears the lines and spawns the next piece
+		self.spawnPiece()
+		self.piece.orientation, self.piece.originCol, self.piece.originRow = placement
+		self.piece.placeBlocks()
+		self.piece.status = 'collided'
+		
+		self.lockPiece()
+		self.clearedLines = self.getCompleteLines()
+		self.updateScores()
+		self.updateSpeed()
+		if self.lineClearStatus == 'clearRunning': #No line clear animation, the lines are dropped right away
+			self.dropFreeBlocks()
+			self.prepareNextSpawn()
+		
+		self.spawnPiece()
+		return len([row for row in self.clearedLines if row >= 0])
+	
+	def getPlacementSuccessor(self,placement): #Copy of the board after commitPlacement(placement), the board itself is not changed
+		board = self.copy()
+		board.commitPlacement(placement)
+		return board
+	
+	def respawnPiece(self,pieceType): #Spawns pieceType in place of the moving piece, for searches over the pieces that can come next
+		if self.gameStatus == 'running' and self.piece.status != 'collided':
+			self.nextPieces[0] = pieceType
+			self.piece.type = pieceType
+			self.piece.status = 'uncreated'
+			self.spawnPiece()
+	
+	# All the game events and mechanics are placed in this function, called at each game loop iteration
+	def gameAction(self):
+		
+		if self.gameStatus == 'firstStart':
+			if self.key.enter.status == 'pressed':
+				self.restart()
+		
+		elif self.gameStatus == 'running':
+			
+			if self.key.restart.trig == True:
+				self.restart()
+				self.key.restart.trig = False
+			
+			if self.gamePause == False:
+			
+				self.piece.move(self.blockMat,self.rowBits)
+				self.checkAndApplyGameOver()
+				
+				if self.key.pause.trig == True:
+					self.gameClock.pause()
+					self.gamePause = True
+					self.key.pause.trig = False
+				
+				if self.gameStatus != 'gameOver':
+					if self.piece.status == 'moving':
+						if self.key.rotate.trig == True:	
+							self.piece.rotate('CW')
+							self.key.rotate.trig = False
+							
+						if self.key.cRotate.trig == True:	
+							self.piece.rotate('cCW')
+							self.key.cRotate.trig = False
+							
+					elif self.piece.status == 'collided':			
+						if self.lineClearStatus == 'idle':
+							self.lockPiece()
+							self.clearedLines = self.getCompleteLines()
+							self.updateScores()
+							self.updateSpeed()
+						elif self.lineClearStatus == 'clearRunning':
+							self.lineClearAnimation()
+						else: # 'clearFin'
+							self.dropFreeBlocks()					
+							self.prepareNextSpawn()
+			
+			else: # self.gamePause = False
+				if self.key.pause.trig == True:
+					self.gameClock.unpause()
+					self.gamePause = False
+					self.key.pause.trig = False
+		
+		else: # 'gameOver'
+			if self.key.enter.status == 'pressed':
+				self.restart()
+	
+	#Event driven time advance: with no key pressed, most frames only poll the clocks. These functions find the frames
+	#in which nothing can happen and jump over them, applying the clock checks those frames would have done
+	def idleFramesLeft(self): #Number of coming frames in which nothing happens if no key is pressed, None if nothing happens until a key is pressed
+		
+		key = self.key
+		if (key.down.status != 'idle' or key.xNav.status != 'idle' or key.enter.status == 'pressed' or
+			key.rotate.trig == True or key.cRotate.trig == True or key.pause.trig == True or key.restart.trig == True):
+			return 0
+		if self.gameStatus != 'running' or self.gamePause == True:
+			return None
+		
+		frameTick = self.gameClock.frameTick
+		if self.piece.status == 'moving': #Next free fall step
+			return max(self.gameClock.fall.nextFrame() - frameTick,0)
+		if self.piece.status == 'collided' and self.lineClearStatus == 'clearRunning': #Next line clear animation stage
+			#The first animation frame (1 frame after the lock) applies stage 0, the next stages start at the multiples of CLEAR_ANI_PERIOD
+			aniFrames = frameTick - self.gameClock.clearAniStart
+			if aniFrames > 1 and aniFrames % CLEAR_ANI_PERIOD != 0:
+				return CLEAR_ANI_PERIOD - (aniFrames % CLEAR_ANI_PERIOD)
+		return 0
+	
+	def skipIdleFrames(self,frameNum): #Advances frameNum frames from idleFramesLeft() without running them
+		
+		if self.gameStatus == 'running' and self.gamePause == False and self.piece.status == 'moving' and frameNum > 0:
+			self.gameClock.move.skipChecks(self.gameClock.frameTick,self.gameClock.frameTick + frameNum - 1)
+			self.piece.createNextMove('noMove') #As every idle frame of a falling piece does
+		self.gameClock.frameTick = self.gameClock.frameTick + frameNum
+	
+	def advanceIdle(self,maxFrames): #Advances maxFrames frames with no key pressed, only running the frames in which something happens
+		
+		frames = 0
+		while frames < maxFrames:
+			idleFrames = self.idleFramesLeft()
+			if idleFrames is None or idleFrames > maxFrames - frames:
+				idleFrames = maxFrames - frames
+			if idleFrames > 0:
+				self.skipIdleFrames(idleFrames)
+				frames = frames + idleFrames
+			else:
+				self.step()
+				frames = frames + 1
+		return frames
+	
+	# One headless frame: apply the game actions and increment the frame tick, with no drawing and no frame cap
+	def step(self):
+		
+		self.gameAction()
+		self.gameClock.update()
+	
+	# One headless frame with an agent action (one of gameState.getLegalActions() or 'restart') tapped during the frame
+	def stepAction(self,action):
+		
+		self.key.pressAction(action)
+		self.gameAction()
+		self.key.releaseAction(action)
+		self.gameClock.update()
+				
+# Class for all the definitions of current moving piece
+class MovingPiece:
+
+	#The piece state is (type, orientation, originRow, originCol), its blocks are looked up from pieceOrientations
+	#so moving or rotating never rebuilds the block coordinates
+
+	def __init__(self,colNum,rowNum,status,gameClock,key,bitboard=False):
+
+		self.colNum = colNum
+		self.rowNum = rowNum
+		
+		self.gameClock = gameClock
+		self.key = key
+
+		self.blockMat = [['empty'] * colNum for i in range(rowNum)] if not bitboard else None #Blocks of the board, with the 'list' board type
+		self.rowBits = [0] * rowNum if bitboard else None #Row bitmasks of the board, with the 'bitboard' board type
+		
+		self.blocks = []
+		for i in range(0,4):
+			self.blocks.append(MovingBlock())
+		
+		self.status = status # 'uncreated' 'moving' 'collided'
+		self.type = 'I' # 'O', 'T', 'S', 'Z', 'J', 'L'
+		self.orientation = 0 #Index in pieceOrientations[self.type]
+		self.originRow = 0
+		self.originCol = 0
+		
+		self.gameOverCondition = False
+		
+		self.dropScore = 0
+		self.lastMoveType = 'noMove'
+	
+	def snapshot(self):
+		return (self.status,self.type,self.orientation,self.originRow,self.originCol,self.gameOverCondition,self.dropScore,self.lastMoveType)
+	
+	def restore(self,snapshot):
+		self.status, self.type, self.orientation, self.originRow, self.originCol, self.gameOverCondition, self.dropScore, self.lastMoveType = snapshot
+		self.placeBlocks()
+	
+	def placeBlocks(self): #Updates the block positions from the piece state
+		orientation = pieceOrientations[self.type][self.orientation]
+		for i in range(0,4):
+			self.blocks[i].currentPos.row = self.originRow + orientation[i][ROW]
+			self.blocks[i].currentPos.col = self.originCol + orientation[i][COL]
+	
+	def applyNextMove(self):
+		self.originRow = self.originRow + directions[self.lastMoveType][ROW]
+		self.originCol = self.originCol + directions[self.lastMoveType][COL]
+		self.placeBlocks()
+	
+	def applyFastMove(self):
+		
+		if self.gameClock.move.check(self.gameClock.frameTick) == True:
+			if self.lastMoveType == 'downRight' or self.lastMoveType == 'downLeft' or self.lastMoveType == 'down':
+				self.dropScore = self.dropScore + 1
+			self.applyNextMove()
+			
+	def slowMoveAction(self):
+	
+		if self.gameClock.fall.check(self.gameClock.frameTick) == True:
+			if self.movCollisionCheck('down') == True:
+				self.createNextMove('noMove')
+				self.status = 'collided'
+			else:
+				self.createNextMove('down')
+				self.applyNextMove()		
+			
+	def createNextMove(self,moveType): #The next move is applied from the current origin by applyNextMove
+		
+		self.lastMoveType = moveType
+	
+	def collisionCheck(self,orientation,originRow,originCol): #Collision check of a whole orientation at the given origin
+		if self.rowBits is not None:
+			return self.bitCollisionCheck(orientation,originRow,originCol)
+		for block in pieceOrientations[self.type][orientation]:
+			row = originRow + block[ROW]
+			col = originCol + block[COL]
+			if row > self.rowNum-1 or row < 0 or col > self.colNum-1 or col < 0 or self.blockMat[row][col] != 'empty':
+				return True
+		return False
+	
+	def bitCollisionCheck(self,orientation,originRow,originCol): #Same check as collisionCheck, using the row bitmasks
+		for rowOffset, colBits in pieceRowMasks[self.type][orientation]:
+			row = originRow + rowOffset
+			if row > self.rowNum-1 or row < 0:
+				return True
+			if originCol < 0:
+				if colBits & ((1 << -originCol) - 1): #Blocks on the left of the board
+					return True
+				colBits = colBits >> -originCol
+			else:
+				colBits = colBits << originCol
+			if colBits >> self.colNum or self.rowBits[row] & colBits: #Blocks on the right of the board or on existing blocks
+				return True
+		return False
+	
+	def movCollisionCheck(self,dirType): #Collision check for next move
+		return self.collisionCheck(self.orientation,self.originRow+directions[dirType][ROW],self.originCol+directions[dirType][COL])
+		
+	def rotCollisionCheck(self,orientation): #Collision check for rotation
+		return self.collisionCheck(orientation,self.originRow,self.originCol)
+		
+	def spawnCollisionCheck(self,origin): #Collision check for spawn, the rows above the board are not checked
+		if self.rowBits is not None:
+			for rowOffset, colBits in pieceRowMasks[self.type][0]:
+				if origin[ROW] + rowOffset >= 0 and self.rowBits[origin[ROW] + rowOffset] & (colBits << origin[COL]):
+					return True
+			return False
+
+		for i in range(0,4):
+			spawnRow = origin[ROW] + pieceDefs[self.type][i][ROW]			
+			spawnCol = origin[COL] + pieceDefs[self.type][i][COL]
+			if spawnRow >= 0 and spawnCol >= 0:
+				if self.blockMat[spawnRow][spawnCol] != 'empty':
+					return True
+		return False
+	
+	def rotate(self,rotationType):
+		
+		if self.type != 'O':
+			if rotationType == 'CW':
+				nextOrientation = (self.orientation + 1) % 4
+			else:
+				nextOrientation = (self.orientation - 1) % 4
+			
+			if self.rotCollisionCheck(nextOrientation) == False:
+				self.orientation = nextOrientation
+				self.placeBlocks()
+	
+	#Breadth first search over the piece states reachable from the current one with the moves and rotations the game allows
+	#(diagonal moves only when the piece can move down, like MovingPiece.move). Gravity timing is not taken into account.
+	#Returns the resting placements as (orientation, originCol, landingRow) tuples, placements covering the same cells are listed once
+	def findPlacements(self):
+		
+		if self.type == 'O':
+			rotations = ()
+		else:
+			rotations = (1,-1)
+		
+		start = (self.orientation,self.originRow,self.originCol)
+		reached = set([start])
+		queue = collections.deque([start])
+		placements = []
+		placementCells = set()
+		while len(queue) > 0:
+			orientation, row, col = queue.popleft()
+			
+			nextStates = [(orientation,row,col-1),(orientation,row,col+1)]
+			if self.collisionCheck(orientation,row+1,col) == True:
+				cells = tuple(sorted((row+block[ROW],col+block[COL]) for block in pieceOrientations[self.type][orientation]))
+				if cells not in placementCells:
+					placementCells.add(cells)
+					placements.append((orientation,col,row))
+			else:
+				nextStates = nextStates + [(orientation,row+1,col),(orientation,row+1,col-1),(orientation,row+1,col+1)]
+			for rotation in rotations:
+				nextStates.append(((orientation+rotation) % 4,row,col))
+			
+			for nextState in nextStates:
+				if nextState not in reached:
+					reached.add(nextState)
+					if self.collisionCheck(*nextState) == False:
+						queue.append(nextState)
+		return placements
+
+	def spawn(self):
+
+		self.dropScore = 0
+		
+		origin = [0,3]
+		
+		spawnTry = 0
+		while spawnTry < 2:
+			if self.spawnCollisionCheck(origin) == False:
+				break
+			else: 
+				spawnTry = spawnTry + 1
+				origin[ROW] = origin[ROW] - 1
+				self.gameOverCondition = True
+				self.status = 'collided'
+		
+		self.orientation = 0
+		self.originRow = origin[ROW]
+		self.originCol = origin[COL]
+		self.placeBlocks()
+				
+	def move(self,lastBlockMat,lastRowBits=None):
+	
+		if self.status == 'uncreated':
+			self.status = 'moving'
+			self.blockMat = lastBlockMat
+			self.rowBits = lastRowBits			
+			self.spawn()
+			
+		elif self.status == 'moving':			
+			
+			if self.key.down.status == 'pressed':			
+				if self.key.xNav.status == 'right':
+					if self.movCollisionCheck('down') == True:
+						self.createNextMove('noMove')
+						self.status = 'collided'
+					elif self.movCollisionCheck('downRight') == True:
+						self.createNextMove('down')
+					else:
+						self.createNextMove('downRight')
+
+				elif self.key.xNav.status == 'left':					
+					if self.movCollisionCheck('down') == True:
+						self.createNextMove('noMove')
+						self.status = 'collided'
+					elif self.movCollisionCheck('downLeft') == True:
+						self.createNextMove('down')
+					else:
+						self.createNextMove('downLeft')
+						
+				else: # 'idle'
+					if self.movCollisionCheck('down') == True:
+						self.createNextMove('noMove')
+						self.status = 'collided'
+					else:
+						self.createNextMove('down')
+					
+				self.applyFastMove()
+					
+			elif self.key.down.status == 'idle':
+				if self.key.xNav.status == 'right':
+					if self.movCollisionCheck('right') == True:
+						self.createNextMove('noMove')
+					else:
+						self.createNextMove('right')
+				elif self.key.xNav.status == 'left':
+					if self.movCollisionCheck('left') == True:
+						self.createNextMove('noMove')
+					else:
+						self.createNextMove('left')
+				else:
+					self.createNextMove('noMove')
+					
+				self.applyFastMove()
+				
+				self.slowMoveAction()
+					
+			else: # 'released'
+				self.key.down.status = 'idle'
+				#self.gameClock.fall.preFrame = self.gameClock.frameTick #Commented out because each seperate down key press and release creates a delay which makes the game easier
+			
+		#else: # 'collided'			
+
+
+# Class for the blocks of the moving piece. Each piece is made of 4 blocks in Tetris game		
+class MovingBlock:
+
+	def __init__(self):
+
+		self.currentPos = self.CurrentPosClass(0,0)
+	
+	class CurrentPosClass:
+	
+		def __init__(self,row,col):
+			self.row = row
+			self.col = col
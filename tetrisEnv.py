@@ -0,0 +1,93 @@
+#Gym style environment over the headless engine: reset(seed) and step(action) -> (observation, reward, done, info)
+#Observations are NumPy uint8 arrays allocated once per environment and rewritten in place at every step,
+#so a learner that keeps an observation across steps has to copy it
+
+import numpy as np
+import tetrisEngine
+from tetrisEngine import pieceNames, actionNames, PieceGenerator, GameKeyInput
+
+#Block codes of the array boards: 0 for empty cells, pieceNames index + 1 for blocks (same codes as batchTetris)
+blockCodes = dict((pieceName, code + 1) for code, pieceName in enumerate(pieceNames))
+blockCodes['empty'] = 0
+
+
+# MainBoard that also keeps its blocks in blockArray, a (rowNum, colNum) uint8 array of block codes
+# The array is updated with the blocks, so reading the board as an array costs nothing
+class ArrayBoard(tetrisEngine.MainBoard):
+
+	def __init__(self,colNum,rowNum,gameClock=None,key=None,boardType='list',pieceGenerator=None,startingLevel=None):
+		tetrisEngine.MainBoard.__init__(self,colNum,rowNum,gameClock,key,boardType,pieceGenerator,startingLevel)
+		self.blockArray = np.zeros((rowNum,colNum),dtype=np.uint8)
+
+	def restart(self):
+		tetrisEngine.MainBoard.restart(self)
+		self.blockArray.fill(0)
+
+	def restore(self,snapshot): #A new array, so the copies made by MainBoard.copy do not share it
+		tetrisEngine.MainBoard.restore(self,snapshot)
+		self.blockArray = self.getBlockArray()
+
+	def rebuildBoardState(self):
+		tetrisEngine.MainBoard.rebuildBoardState(self)
+		self.blockArray[:] = self.getBlockArray()
+
+	def getBlockArray(self): #Block codes of the board's blocks in a new array
+		return np.array([[blockCodes[blockType] for blockType in row] for row in self.getBlockMat()],dtype=np.uint8)
+
+	def setBlock(self,row,col,pieceType):
+		tetrisEngine.MainBoard.setBlock(self,row,col,pieceType)
+		self.blockArray[row,col] = blockCodes[pieceType]
+
+	def eraseBlock(self,row,col):
+		tetrisEngine.MainBoard.eraseBlock(self,row,col)
+		self.blockArray[row,col] = 0
+
+	def dropFreeBlocks(self):
+		clearedRows = [row for row in self.clearedLines if row >= 0]
+		tetrisEngine.MainBoard.dropFreeBlocks(self)
+		if len(clearedRows) > 0:
+			keptRows = self.blockArray[[row for row in range(0,self.rowNum) if row not in clearedRows]]
+			self.blockArray[:len(clearedRows)] = 0
+			self.blockArray[len(clearedRows):] = keptRows
+
+
+class TetrisEnv:
+
+	def __init__(self,colNum=10,rowNum=20,randomizer='uniform',startingLevel=None,boardType='list'):
+		self.board = ArrayBoard(colNum,rowNum,boardType=boardType,pieceGenerator=PieceGenerator(None,randomizer),startingLevel=startingLevel)
+		self.actionNames = actionNames
+
+		#Observation arrays, rewritten in place at every step
+		self.boardObservation = np.zeros((rowNum,colNum),dtype=np.uint8) #Blocks with the moving piece overlaid
+		self.nextPiecesObservation = np.zeros(2,dtype=np.uint8) #Block codes of board.nextPieces
+		self.observation = {'board': self.boardObservation, 'nextPieces': self.nextPiecesObservation}
+
+		self.idleKeys = GameKeyInput().snapshot()
+
+	def reset(self,seed=None): #Starts a new game with the pieces of seed and returns its first observation
+		self.board.pieceGenerator.reset(seed)
+		self.board.key.restore(self.idleKeys)
+		self.board.restart()
+		return self.getObservation()
+
+	def step(self,action): #action is an action name or its index in actionNames. The reward is the score gained in the frame
+		board = self.board
+		if not isinstance(action,str):
+			action = actionNames[action]
+		score = board.score
+		board.stepAction(action)
+		done = board.gameStatus == 'gameOver'
+		info = {'score': board.score, 'lines': board.lines, 'level': board.level, 'frame': board.gameClock.frameTick}
+		return self.getObservation(), board.score - score, done, info
+
+	def getObservation(self):
+		board = self.board
+		np.copyto(self.boardObservation,board.blockArray)
+		if board.piece.status == 'moving':
+			pieceCode = blockCodes[board.piece.type]
+			for block in board.piece.blocks:
+				if block.currentPos.row >= 0:
+					self.boardObservation[block.currentPos.row,block.currentPos.col] = pieceCode
+		self.nextPiecesObservation[0] = blockCodes[board.nextPieces[0]]
+		self.nextPiecesObservation[1] = blockCodes[board.nextPieces[1]]
+		return self.observation
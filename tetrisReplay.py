@@ -0,0 +1,133 @@
+#Compact binary replays: an episode is stored as its seed, starting level, board size and the action of every frame
+#Frames are stored as runs of (action code, run length) bytes, so the long noMove stretches cost 2 bytes per 255 frames
+#Run "python tetrisReplay.py replayFile..." to replay every episode of the files headlessly and check their final scores
+
+import random, struct, sys, time
+import tetrisEngine
+from tetrisEngine import actionNames, PieceGenerator, STARTING_LEVEL
+
+REPLAY_MAGIC = b'TRPL'
+REPLAY_VERSION = 1
+randomizerNames = ('uniform','7bag','history') #The index of a randomizer is its code in the header
+
+#magic, version, randomizer, starting level, column number, row number, seed, frame number, score, lines, level, run number
+replayHeader = struct.Struct('<4sBBBBBQIIIBI')
+
+actionCodes = dict((actionName, code) for code, actionName in enumerate(actionNames))
+NO_MOVE = actionCodes['noMove']
+MAX_RUN = 255
+
+
+class Replay:
+
+	def __init__(self,seed=None,startingLevel=STARTING_LEVEL,colNum=10,rowNum=20,randomizer='uniform'):
+		self.seed = seed if seed is not None else random.getrandbits(64)
+		self.startingLevel = startingLevel
+		self.colNum = colNum
+		self.rowNum = rowNum
+		self.randomizer = randomizer
+		self.actions = bytearray() #One action code per frame
+
+		#Final results of the episode, checked by verify
+		self.score = 0
+		self.lines = 0
+		self.level = startingLevel
+
+	def newBoard(self,boardType='list'): #Board in the first frame of the episode
+		return tetrisEngine.MainBoard(self.colNum,self.rowNum,boardType=boardType,pieceGenerator=PieceGenerator(self.seed,self.randomizer),startingLevel=self.startingLevel)
+
+	def stepAction(self,board,action): #Records action and runs its frame on board
+		self.actions.append(actionCodes[action])
+		board.stepAction(action)
+
+	def setResult(self,board):
+		self.score = board.score
+		self.lines = board.lines
+		self.level = board.level
+
+	def getRuns(self):
+		runs = []
+		actions = self.actions
+		i = 0
+		while i < len(actions):
+			code = actions[i]
+			runEnd = i + 1
+			while runEnd < len(actions) and runEnd - i < MAX_RUN and actions[runEnd] == code:
+				runEnd = runEnd + 1
+			runs.append((code, runEnd - i))
+			i = runEnd
+		return runs
+
+	def encode(self):
+		runs = self.getRuns()
+		header = replayHeader.pack(REPLAY_MAGIC,REPLAY_VERSION,randomizerNames.index(self.randomizer),self.startingLevel,self.colNum,self.rowNum,
+			self.seed,len(self.actions),self.score,self.lines,self.level,len(runs))
+		body = bytearray(2*len(runs))
+		for i, (code, runLength) in enumerate(runs):
+			body[2*i] = code
+			body[2*i + 1] = runLength
+		return header + bytes(body)
+
+	@staticmethod
+	def decode(data,offset=0): #Returns the replay starting at offset and the offset right after it
+		magic, version, randomizerCode, startingLevel, colNum, rowNum, seed, frameNum, score, lines, level, runNum = replayHeader.unpack_from(data,offset)
+		if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+			raise ValueError('not a version {} replay at offset {}'.format(REPLAY_VERSION,offset))
+		offset = offset + replayHeader.size
+		replay = Replay(seed,startingLevel,colNum,rowNum,randomizerNames[randomizerCode])
+		for i in range(offset, offset + 2*runNum, 2):
+			replay.actions.extend(data[i:i+1] * data[i+1])
+		if len(replay.actions) != frameNum:
+			raise ValueError('replay at offset {} has {} frames instead of {}'.format(offset - replayHeader.size,len(replay.actions),frameNum))
+		replay.score = score
+		replay.lines = lines
+		replay.level = level
+		return replay, offset + 2*runNum
+
+	def simulate(self,boardType='list'): #Replays the episode headlessly and returns the board in its last frame
+		board = self.newBoard(boardType)
+		for code, runLength in self.getRuns():
+			if code == NO_MOVE: #Idle frames are jumped over by the board
+				board.advanceIdle(runLength)
+			else:
+				action = actionNames[code]
+				for i in range(0,runLength):
+					board.stepAction(action)
+		return board
+
+	def verify(self,boardType='list'):
+		board = self.simulate(boardType)
+		return (board.score, board.lines, board.level) == (self.score, self.lines, self.level)
+
+
+def writeReplays(path,replays,mode='ab'): #Replays are appended to the file by default, so one file can hold many episodes
+	with open(path,mode) as replayFile:
+		for replay in replays:
+			replayFile.write(replay.encode())
+
+def readReplays(path):
+	with open(path,'rb') as replayFile:
+		data = replayFile.read()
+	replays = []
+	offset = 0
+	while offset < len(data):
+		replay, offset = Replay.decode(data,offset)
+		replays.append(replay)
+	return replays
+
+
+if __name__ == '__main__':
+	failedNum = 0
+	replayNum = 0
+	frameNum = 0
+	startTime = time.perf_counter()
+	for path in sys.argv[1:]:
+		for replay in readReplays(path):
+			replayNum = replayNum + 1
+			frameNum = frameNum + len(replay.actions)
+			if not replay.verify():
+				failedNum = failedNum + 1
+				print('{}: replay {} (seed {}) does not reach score {}, lines {}, level {}'.format(path,replayNum,replay.seed,replay.score,replay.lines,replay.level))
+	elapsed = time.perf_counter() - startTime
+	print('{} replays, {} frames, {} failed, {:.0f} frames/s'.format(replayNum,frameNum,failedNum,frameNum/elapsed if elapsed > 0 else 0))
+	sys.exit(1 if failedNum > 0 else 0)
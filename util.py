@@ -15,6 +15,7 @@
 import sys
 import inspect
 import heapq, random
+import collections
 
 
 
@@ -87,6 +88,131 @@ class PriorityQueue:
     def isEmpty(self):
         return len(self.heap) == 0
 
+class RingBuffer:
+    """
+      A container with a fixed capacity. Once it is full, adding an item
+      drops the oldest one, so its memory never grows. Items are indexed
+      like a list, from the oldest (0) to the newest (-1), in O(1).
+    """
+    def __init__(self, capacity, items=()):
+        self.capacity = capacity
+        self.list = [None] * capacity
+        self.start = 0
+        self.size = 0
+        for item in items:
+            self.push(item)
+
+    def push(self, item):
+        "Adds 'item' as the newest item, dropping the oldest one if full"
+        end = (self.start + self.size) % self.capacity
+        self.list[end] = item
+        if self.size < self.capacity:
+            self.size += 1
+        else:
+            self.start = (self.start + 1) % self.capacity
+
+    append = push # so it can stand in for a list that is only appended to
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.size
+        if index < 0 or index >= self.size:
+            raise IndexError('RingBuffer index out of range')
+        return self.list[(self.start + index) % self.capacity]
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        for index in range(self.size):
+            yield self.list[(self.start + index) % self.capacity]
+
+    def isEmpty(self):
+        "Returns true if the buffer is empty"
+        return self.size == 0
+
+    def copy(self):
+        return RingBuffer(self.capacity, self)
+
+class LRUCache:
+    """
+      A dict with a fixed capacity. Once it is full, adding a key drops the
+      least recently used one. Lookups are counted in hits and misses.
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.dict = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        "Returns the value of 'key', or 'default' if it is not cached"
+        try:
+            value = self.dict[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.dict.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        "Caches 'value' for 'key', dropping the least recently used key if full"
+        self.dict[key] = value
+        self.dict.move_to_end(key)
+        if len(self.dict) > self.capacity:
+            self.dict.popitem(last=False)
+
+    def __contains__(self, key):
+        return key in self.dict
+
+    def __len__(self):
+        return len(self.dict)
+
+    def hitRate(self):
+        "Returns the fraction of the lookups that were hits"
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+    def clear(self):
+        self.dict.clear()
+        self.hits = 0
+        self.misses = 0
+
+class FeatureIndex:
+    """
+      Registry of feature names. Every name gets a fixed index, the position
+      of its value in feature vectors and of its weight in weight vectors.
+      Names that are not registered yet get the next free index.
+    """
+    def __init__(self, names=()):
+        self.indices = {}
+        self.names = []
+        for name in names:
+            self.add(name)
+
+    def add(self, name):
+        "Returns the index of 'name', registering it if needed"
+        index = self.indices.get(name)
+        if index is None:
+            index = len(self.names)
+            self.indices[name] = index
+            self.names.append(name)
+        return index
+
+    def get(self, name, default=None):
+        "Returns the index of 'name', or 'default' if it is not registered"
+        return self.indices.get(name, default)
+
+    def __contains__(self, name):
+        return name in self.indices
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self.names)
+
 class PriorityQueueWithFunction(PriorityQueue):
     """
     Implements a priority queue with the same push/pop signature of the
@@ -177,7 +303,7 @@ class Counter(dict):
         Returns the key with the highest value.
         """
         if len(self.keys()) == 0: return None
-        all = self.items()
+        all = list(self.items())
         values = [x[1] for x in all]
         maxIndex = values.index(max(values))
         return all[maxIndex][0]
@@ -399,8 +525,8 @@ def getProbability(value, distribution, values):
             total += prob
     return total
 
-def flipCoin( p ):
-    r = random.random()
+def flipCoin( p, rng=random ):
+    r = rng.random()
     return r < p
 
 def chooseFromDistribution( distribution ):